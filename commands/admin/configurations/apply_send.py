@@ -2,9 +2,11 @@
 
 import logging
 import discord
+from bson import ObjectId
 from discord import app_commands
 from discord.ext import commands
 from config.mongo import apply_collection
+from config.router import routed_view
 from config.params import (
     EMBED_COLOR,
     EMBED_FOOTER_TEXT,
@@ -17,92 +19,154 @@ from config.params import (
 log = logging.getLogger(__name__)
 
 
-class AdminActionView(discord.ui.View):
-    def __init__(self, member: discord.Member, app_name: str, channel: discord.TextChannel, cfg: dict):
-        super().__init__(timeout=None)  # pas d'expiration automatique
-        self.member = member
-        self.app_name = app_name
-        self.channel = channel
-        self.cfg = cfg
+class ApplyActionButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"apply:(?P<application_id>[0-9a-f]{24}):(?P<action>accept|reject)"
+):
+    """Accepter / Refuser une candidature ; l'état est relu dans Mongo à chaque clic."""
+
+    def __init__(self, application_id: ObjectId, action: str, disabled: bool = False):
+        accept = action == "accept"
+        super().__init__(discord.ui.Button(
+            label="Accepter" if accept else "Refuser",
+            style=discord.ButtonStyle.success if accept else discord.ButtonStyle.danger,
+            disabled=disabled,
+            custom_id=f"apply:{application_id}:{action}"
+        ))
+        self.application_id = application_id
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(ObjectId(match["application_id"]), match["action"])
+
+    async def callback(self, interaction: discord.Interaction):
+        await on_apply_action(interaction, self.application_id, self.action)
+
+
+def admin_action_view(application_id: ObjectId, disabled: bool = False) -> discord.ui.View:
+    """Boutons du staff sous une candidature (DynamicItem ApplyActionButton)."""
+    return routed_view(
+        ApplyActionButton(application_id, "accept", disabled),
+        ApplyActionButton(application_id, "reject", disabled),
+    )
 
-    @discord.ui.button(label="Accepter", style=discord.ButtonStyle.success)
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Vérification des permissions du bot
-        me = interaction.guild.me
-        if not me.guild_permissions.manage_roles:
-            return await interaction.response.send_message(
-                "❌ Je n'ai pas la permission `Gérer les rôles`. Merci de me l'accorder.",
-                ephemeral=True
-            )
 
-        # Récupère l'ID de rôle configuré
-        roles_map = self.cfg.get("application_roles", {})
-        role_id = roles_map.get(self.app_name)
-        if not role_id:
-            return await interaction.response.send_message(
-                f"❌ Aucun rôle configuré pour {self.app_name}.", ephemeral=True
-            )
+async def on_apply_action(interaction: discord.Interaction, application_id: ObjectId, action: str):
+    # Lecture pour les vérifications seulement : la transition de statut est faite par _claim
+    doc = await apply_collection.find_one({"_id": application_id})
+    if not doc or doc.get("status") != "pending":
+        await interaction.response.edit_message(view=admin_action_view(application_id, disabled=True))
+        return await interaction.followup.send("Cette candidature a déjà été traitée.", ephemeral=True)
 
-        role = interaction.guild.get_role(role_id)
-        if not role:
+    app_name = doc["app_name"]
+    member = interaction.guild.get_member(doc["user_id"])
+    if member is None:
+        try:
+            member = await interaction.guild.fetch_member(doc["user_id"])
+        except discord.NotFound:
             return await interaction.response.send_message(
-                f"❌ Le rôle (ID {role_id}) est introuvable sur ce serveur.", ephemeral=True
+                "❌ Ce membre a quitté le serveur.", ephemeral=True
             )
 
-        # Vérifie la hiérarchie
-        if me.top_role <= role:
-            return await interaction.response.send_message(
-                "❌ Je ne peux pas attribuer ce rôle car il est supérieur ou égal à mon rôle le plus élevé.",
-                ephemeral=True
-            )
+    if action == "accept":
+        await _accept(interaction, doc, member, app_name)
+    else:
+        await _reject(interaction, doc, member, app_name)
 
-        # Désactive les boutons pour toutes les actions
-        for child in self.children:
-            child.disabled = True
-        # On édite le message d'origine (celui qui contient les boutons)
-        await interaction.message.edit(view=self)
 
-        # Tente d'ajouter le rôle
-        try:
-            await self.member.add_roles(role, reason="Candidature acceptée")
-            await interaction.response.send_message(
-                f"✅ Le rôle {role.mention} a été attribué à {self.member.mention}.",
-                ephemeral=False
-            )
-            log.info("Rôle %s attribué à %s", role.name, self.member)
-        except discord.Forbidden:
-            await interaction.followup.send(
-                "❌ Impossible d'ajouter le rôle (permissions ou hiérarchie).",
-                ephemeral=True
-            )
-        except Exception as e:
-            log.exception("Erreur lors de l'ajout du rôle", exc_info=e)
-            await interaction.followup.send(
-                "❌ Une erreur est survenue lors de l'attribution du rôle.",
-                ephemeral=True
-            )
+async def _claim(interaction: discord.Interaction, doc: dict, status: str) -> bool:
+    """Passe la candidature de pending à `status` ; False si un autre membre du staff l'a traitée entre-temps."""
+    claimed = await apply_collection.find_one_and_update(
+        {"_id": doc["_id"], "status": "pending"},
+        {"$set": {"status": status, "handled_by": interaction.user.id, "handled_at": discord.utils.utcnow()}}
+    )
+    if claimed is None:
+        await interaction.response.edit_message(view=admin_action_view(doc["_id"], disabled=True))
+        await interaction.followup.send("Cette candidature a déjà été traitée.", ephemeral=True)
+        return False
+    return True
+
+
+async def _accept(interaction: discord.Interaction, doc: dict, member: discord.Member, app_name: str):
+    # Vérification des permissions du bot
+    me = interaction.guild.me
+    if not me.guild_permissions.manage_roles:
+        return await interaction.response.send_message(
+            "❌ Je n'ai pas la permission `Gérer les rôles`. Merci de me l'accorder.",
+            ephemeral=True
+        )
+
+    # Récupère l'ID de rôle enregistré avec la candidature
+    roles_map = doc.get("application_roles", {})
+    role_id = roles_map.get(app_name)
+    if not role_id:
+        return await interaction.response.send_message(
+            f"❌ Aucun rôle configuré pour {app_name}.", ephemeral=True
+        )
 
-    @discord.ui.button(label="Refuser", style=discord.ButtonStyle.danger)
-    async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Désactive les boutons
-        for child in self.children:
-            child.disabled = True
-        await interaction.message.edit(view=self)
+    role = interaction.guild.get_role(role_id)
+    if not role:
+        return await interaction.response.send_message(
+            f"❌ Le rôle (ID {role_id}) est introuvable sur ce serveur.", ephemeral=True
+        )
 
-        dm_message = (
-            f"Désolé {self.member.name}, vous avez été refusé pour le poste **{self.app_name}** "
-            f"sur le serveur **{interaction.guild.name}**."
+    # Vérifie la hiérarchie
+    if me.top_role <= role:
+        return await interaction.response.send_message(
+            "❌ Je ne peux pas attribuer ce rôle car il est supérieur ou égal à mon rôle le plus élevé.",
+            ephemeral=True
+        )
+
+    # Transition atomique avant toute action : deux clics simultanés ne traitent pas deux fois
+    if not await _claim(interaction, doc, "accepted"):
+        return
+
+    # Désactive les boutons sur le message d'origine (celui qui contient les boutons)
+    await interaction.response.edit_message(view=admin_action_view(doc["_id"], disabled=True))
+
+    # Tente d'ajouter le rôle
+    try:
+        await member.add_roles(role, reason="Candidature acceptée")
+        await interaction.followup.send(
+            f"✅ Le rôle {role.mention} a été attribué à {member.mention}.",
+            ephemeral=False
+        )
+        log.info("Rôle %s attribué à %s", role.name, member)
+    except discord.Forbidden:
+        await interaction.followup.send(
+            "❌ Impossible d'ajouter le rôle (permissions ou hiérarchie).",
+            ephemeral=True
+        )
+    except Exception as e:
+        log.exception("Erreur lors de l'ajout du rôle", exc_info=e)
+        await interaction.followup.send(
+            "❌ Une erreur est survenue lors de l'attribution du rôle.",
+            ephemeral=True
+        )
+
+
+async def _reject(interaction: discord.Interaction, doc: dict, member: discord.Member, app_name: str):
+    if not await _claim(interaction, doc, "rejected"):
+        return
+
+    # Désactive les boutons
+    await interaction.response.edit_message(view=admin_action_view(doc["_id"], disabled=True))
+
+    dm_message = (
+        f"Désolé {member.name}, vous avez été refusé pour le poste **{app_name}** "
+        f"sur le serveur **{interaction.guild.name}**."
+    )
+    try:
+        await member.send(dm_message)
+        await interaction.followup.send(
+            f"Utilisateur {member.mention} informé du refus en DM.", ephemeral=False
+        )
+    except discord.Forbidden:
+        await interaction.followup.send(
+            f"❌ Impossible d'envoyer le DM à {member.mention}. Merci de le contacter manuellement.",
+            ephemeral=False
         )
-        try:
-            await self.member.send(dm_message)
-            await interaction.response.send_message(
-                f"Utilisateur {self.member.mention} informé du refus en DM.", ephemeral=False
-            )
-        except discord.Forbidden:
-            await interaction.response.send_message(
-                f"❌ Impossible d'envoyer le DM à {self.member.mention}. Merci de le contacter manuellement.",
-                ephemeral=False
-            )
 
 
 class ApplySendView(discord.ui.View):
@@ -170,7 +234,7 @@ class ApplySendView(discord.ui.View):
                     "timestamp": discord.utils.utcnow(),
                     "application_roles": cfg["application_roles"]
                 }
-                await apply_collection.insert_one(doc)
+                res = await apply_collection.insert_one(doc)
 
                 # Prépare l’embed pour le staff
                 embed_admin = discord.Embed(
@@ -184,8 +248,7 @@ class ApplySendView(discord.ui.View):
 
                 staff_channel = modal_inter.guild.get_channel(cfg.get("channel_id"))
                 if staff_channel:
-                    view = AdminActionView(modal_inter.user, modal_self.app_name, staff_channel, cfg)
-                    await staff_channel.send(embed=embed_admin, view=view)
+                    await staff_channel.send(embed=embed_admin, view=admin_action_view(res.inserted_id))
                 else:
                     log.warning("Salon de réception non trouvé (ID %s)", cfg.get("channel_id"))
 
@@ -210,6 +273,12 @@ class ApplyFlowCog(commands.Cog):
         self.bot = bot
         self.cfg = {}
 
+    async def cog_load(self):
+        self.bot.add_dynamic_items(ApplyActionButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(ApplyActionButton)
+
     @app_commands.command(
         name="apply_send",
         description="Publie le menu de candidature dans ce salon"
@@ -233,7 +302,7 @@ class ApplyFlowCog(commands.Cog):
         # Conversion en int des rôles_by_app
         roles_map = self.cfg.get("roles_by_app", {})
         self.cfg["roles_by_app"] = {app: [int(r) for r in lst] for app, lst in roles_map.items()}
-        # Mapping simple pour AdminActionView (1er rôle si plusieurs)
+        # Mapping simple pour les boutons du staff (1er rôle si plusieurs)
         self.cfg["application_roles"] = {app: ids[0] for app, ids in self.cfg["roles_by_app"].items()}
 
         # L’embed candidat est envoyé dans le salon courant ; les candidatures staff iront dans channel_id de la config
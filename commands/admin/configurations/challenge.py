@@ -1,11 +1,15 @@
+import asyncio
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 from urllib.parse import urlparse
 
 from config.mongo import challenges_collection
+from config.scheduler import DeadlineScheduler
+from config.router import routed_view
 from config.params import (
     EMBED_COLOR,
     EMBED_FOOTER_TEXT,
@@ -15,6 +19,11 @@ from config.params import (
 
 EMOJIS = {"participate": "✅", "finish": "⏱️"}
 
+# Nombre de challenges finalisés en parallèle quand plusieurs échéances tombent ensemble
+FINALIZE_CONCURRENCY = 5
+# Pendant une rafale de votes, un message de participation est édité au plus une fois par intervalle
+VOTE_EDIT_INTERVAL = 1.0
+
 
 def is_valid_image_url(url: str) -> bool:
     try:
@@ -66,12 +75,7 @@ class SubmissionModal(discord.ui.Modal, title="Soumettre une participation"):
         if sub["url"] and is_valid_image_url(sub["url"]):
             embed.set_image(url=sub["url"])
 
-        view = discord.ui.View()
-        view.add_item(discord.ui.Button(
-            label="Voter",
-            custom_id=f"vote_{sub['submission_id']}",
-            style=discord.ButtonStyle.secondary
-        ))
+        view = routed_view(VoteButton(sub["submission_id"]))
 
         try:
             await self.thread.send(embed=embed, view=view)
@@ -86,18 +90,118 @@ class SubmissionModal(discord.ui.Modal, title="Soumettre une participation"):
         )
 
 
-class ChallengeView(discord.ui.View):
-    def __init__(self, challenge_id: ObjectId, thread: discord.Thread):
-        super().__init__(timeout=None)
+class ChallengeButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"(?:challenge:(?P<challenge_id>[0-9a-f]{24}):|challenge_)(?P<action>participate|finish)"
+):
+    """
+    Participer / Finir d'un challenge. Les anciens custom_ids (challenge_<action>) n'ont pas
+    d'identifiant : le challenge est alors retrouvé par l'id du message.
+    """
+
+    def __init__(self, challenge_id: ObjectId | None, action: str, disabled: bool = False):
+        participate = action == "participate"
+        super().__init__(discord.ui.Button(
+            label="Participer" if participate else "Finir Maintenant",
+            style=discord.ButtonStyle.primary if participate else discord.ButtonStyle.danger,
+            disabled=disabled,
+            custom_id=f"challenge:{challenge_id}:{action}" if challenge_id else f"challenge_{action}"
+        ))
         self.challenge_id = challenge_id
-        self.thread = thread
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        challenge_id = ObjectId(match["challenge_id"]) if match["challenge_id"] else None
+        return cls(challenge_id, match["action"])
+
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.client.get_cog("Challenge").on_challenge_button(interaction, self.action, self.challenge_id)
+
+
+class VoteButton(discord.ui.DynamicItem[discord.ui.Button], template=r"vote[:_](?P<submission_id>[0-9a-f]{24})"):
+    """Bouton de vote d'une participation (vote:<id>, ou vote_<id> sur les anciens messages)."""
+
+    def __init__(self, submission_id: ObjectId, custom_id: str = None):
+        super().__init__(discord.ui.Button(
+            label="Voter", style=discord.ButtonStyle.secondary, custom_id=custom_id or f"vote:{submission_id}"
+        ))
+        self.submission_id = submission_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(ObjectId(match["submission_id"]), item.custom_id)
+
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.client.get_cog("Challenge").on_vote(interaction, self.submission_id)
+
+
+def challenge_view(challenge_id: ObjectId, disabled: bool = False) -> discord.ui.View:
+    """Boutons du message de challenge (DynamicItem ChallengeButton)."""
+    return routed_view(
+        ChallengeButton(challenge_id, "participate", disabled),
+        ChallengeButton(challenge_id, "finish", disabled),
+    )
+
+
+class Challenge(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.scheduler = DeadlineScheduler(
+            self._on_deadline, name="challenges", concurrency=FINALIZE_CONCURRENCY
+        )
+        # Challenges marqués terminés mais pas supprimés (arrêt pendant la finalisation)
+        self._recovering: set[ObjectId] = set()
+        # message_id -> (message le plus récent, nombre de votes à afficher) ; une tâche d'édition par message
+        self._pending_votes: dict[int, tuple[discord.Message, int]] = {}
+        self._vote_edits: dict[int, asyncio.Task] = {}
+
+    async def cog_load(self):
+        self.bot.add_dynamic_items(ChallengeButton, VoteButton)
+        async for chal in challenges_collection.find({}, {"deadline": 1, "finished": 1}).sort("deadline", 1):
+            if chal.get("finished"):
+                self._recovering.add(chal["_id"])
+                self.scheduler.schedule(datetime.utcnow(), chal["_id"])
+            else:
+                self.scheduler.schedule(chal["deadline"], chal["_id"])
+        self.scheduler.start()
+
+    def cog_unload(self):
+        self.bot.remove_dynamic_items(ChallengeButton, VoteButton)
+        self.scheduler.stop()
+        for task in self._vote_edits.values():
+            task.cancel()
+
+    async def _on_deadline(self, challenge_id: ObjectId):
+        await self.bot.wait_until_ready()   # échéances dépassées pendant un redémarrage
+        if challenge_id in self._recovering:
+            self._recovering.discard(challenge_id)
+            chal = await challenges_collection.find_one({"_id": challenge_id})
+            if chal:
+                await self._finalize(chal)
+            return
+        await self._finish_challenge(None, challenge_id, None)
+
+    async def on_challenge_button(self, interaction: discord.Interaction, action: str, challenge_id: ObjectId = None):
+        query = {"_id": challenge_id} if challenge_id else {"message_id": interaction.message.id}
+        chal = await challenges_collection.find_one(query, {"thread_id": 1, "finished": 1})
+        if not chal or chal.get("finished"):
+            return await interaction.response.send_message("Ce challenge est déjà terminé.", ephemeral=True)
+
+        if action == "finish":
+            if not interaction.user.guild_permissions.ban_members:
+                return await interaction.response.send_message("Permission refusée.", ephemeral=True)
+            await interaction.response.defer()
+            # finir le challenge (résultats + boutons désactivés en une seule édition)
+            done = await self._finish_challenge(interaction, chal["_id"], None)
+            if not done:
+                await interaction.followup.send("Ce challenge est déjà terminé.", ephemeral=True)
+            return
 
-    @discord.ui.button(label="Participer", style=discord.ButtonStyle.primary, custom_id="challenge_participate")
-    async def participate(self, interaction: discord.Interaction, button: discord.ui.Button):
         user_id = str(interaction.user.id)
         # 1) empêcher participations multiples
         exists = await challenges_collection.count_documents({
-            "_id": self.challenge_id,
+            "_id": chal["_id"],
             "submissions.author_id": user_id
         })
         if exists:
@@ -105,108 +209,101 @@ class ChallengeView(discord.ui.View):
                 "Vous avez déjà soumis une participation à ce challenge.", ephemeral=True
             )
         # 2) sinon ouvrir le modal
-        await interaction.response.send_modal(SubmissionModal(self.challenge_id, self.thread))
-
-    @discord.ui.button(label="Finir Maintenant", style=discord.ButtonStyle.danger, custom_id="challenge_finish")
-    async def finish(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.user.guild_permissions.ban_members:
-            return await interaction.response.send_message("Permission refusée.", ephemeral=True)
-        # finir le challenge
-        await self._finish(interaction)
-        # désactiver chaque bouton de cette view
-        for item in self.children:
-            item.disabled = True
-        await interaction.message.edit(view=self)
-        await interaction.response.defer()
-
-    async def _finish(self, interaction: discord.Interaction):
-        await interaction.client.get_cog("Challenge")._finish_challenge(
-            interaction, self.challenge_id, self.thread
-        )
-
+        thread = self.bot.get_channel(chal.get("thread_id"))
+        if thread is None:
+            thread = await self.bot.fetch_channel(chal["thread_id"])
+        await interaction.response.send_modal(SubmissionModal(chal["_id"], thread))
 
-class Challenge(commands.Cog):
-    def __init__(self, bot: commands.Bot):
-        self.bot = bot
-        self.check_deadlines.start()
-
-    def cog_unload(self):
-        self.check_deadlines.cancel()
-
-    @tasks.loop(minutes=1)
-    async def check_deadlines(self):
-        now = datetime.utcnow()
-        expired = await challenges_collection.find({
-            "deadline": {"$lte": now},
-            "channel_id": {"$exists": True},
-            "thread_id": {"$exists": True},
-        }).to_list(100)
-
-        for chal in expired:
-            channel = self.bot.get_channel(chal["channel_id"])
-            thread = discord.utils.get(channel.threads, id=chal["thread_id"])
-            await self._finish_challenge(None, chal["_id"], thread)
-
-            # désactiver les boutons du message initial
-            original = await thread.parent.fetch_message(chal["message_id"])
-            if original.components:
-                view = original.view or discord.ui.View.from_message(original)
-                for item in view.children:
-                    item.disabled = True
-                await original.edit(view=view)
-
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        cid = interaction.data.get("custom_id", "")
-        if not cid.startswith("vote_"):
-            return
-
-        submission_id = ObjectId(cid.split("_", 1)[1])
+    async def on_vote(self, interaction: discord.Interaction, submission_id: ObjectId):
         user_id = str(interaction.user.id)
 
-        chal = await challenges_collection.find_one({
-            "submissions.submission_id": submission_id
-        })
-        if not chal:
-            return await interaction.response.send_message("Participation introuvable.", ephemeral=True)
+        # Vote enregistré en une seule opération : les gardes (auteur, déjà voté, challenge en cours)
+        # sont dans le filtre, deux clics simultanés ne peuvent pas compter deux fois
+        chal = await challenges_collection.find_one_and_update(
+            {
+                "finished": {"$ne": True},
+                "submissions": {"$elemMatch": {
+                    "submission_id": submission_id,
+                    "author_id": {"$ne": user_id},
+                    "votes": {"$ne": user_id},
+                }},
+            },
+            {"$addToSet": {"submissions.$.votes": user_id}},
+            projection={"submissions": {"$elemMatch": {"submission_id": submission_id}}},
+            return_document=ReturnDocument.AFTER
+        )
+        if chal is None:
+            return await interaction.response.send_message(await self._vote_refusal(submission_id, user_id), ephemeral=True)
 
-        sub = next(s for s in chal["submissions"] if s["submission_id"] == submission_id)
+        await interaction.response.send_message("Votre vote a bien été pris en compte !", ephemeral=True)
+        self._queue_vote_edit(interaction.message, len(chal["submissions"][0]["votes"]))
 
+    async def _vote_refusal(self, submission_id: ObjectId, user_id: str) -> str:
+        """Raison d'un vote refusé (relue seulement dans ce cas)."""
+        chal = await challenges_collection.find_one(
+            {"submissions.submission_id": submission_id},
+            {"finished": 1, "submissions": {"$elemMatch": {"submission_id": submission_id}}}
+        )
+        if not chal:
+            return "Participation introuvable."
+        sub = chal["submissions"][0]
         # auto-vote
         if sub["author_id"] == user_id:
-            return await interaction.response.send_message(
-                "Vous ne pouvez pas voter pour votre propre participation.", ephemeral=True
-            )
+            return "Vous ne pouvez pas voter pour votre propre participation."
         # vote multiple
         if user_id in sub["votes"]:
-            return await interaction.response.send_message(
-                "Vous avez déjà voté pour cette participation.", ephemeral=True
-            )
-
-        # enregistrer le vote
-        await challenges_collection.update_one(
-            {"_id": chal["_id"], "submissions.submission_id": submission_id},
-            {"$push": {"submissions.$.votes": user_id}}
-        )
-
-        # mettre à jour l’embed
-        msg = await interaction.channel.fetch_message(interaction.message.id)
-        embed = msg.embeds[0]
-        lines = [l for l in embed.description.split("\n") if not l.startswith("Votes")]
-        votes_count = len(sub["votes"]) + 1
-        lines.append(f"Votes : {votes_count}")
-        embed.description = "\n".join(lines)
-        await msg.edit(embed=embed)
-
-        await interaction.response.send_message("Votre vote a bien été pris en compte !", ephemeral=True)
+            return "Vous avez déjà voté pour cette participation."
+        return "Ce challenge est déjà terminé."
+
+    def _queue_vote_edit(self, message: discord.Message, votes: int):
+        pending = self._pending_votes.get(message.id)
+        self._pending_votes[message.id] = (message, max(votes, pending[1] if pending else 0))
+        if message.id not in self._vote_edits:
+            self._vote_edits[message.id] = asyncio.create_task(self._flush_vote_edits(message.id))
+
+    async def _flush_vote_edits(self, message_id: int):
+        """Édite le message avec le dernier compte connu, puis attend avant la prochaine édition."""
+        shown = 0
+        try:
+            while message_id in self._pending_votes:
+                message, votes = self._pending_votes.pop(message_id)
+                if votes <= shown:
+                    continue
+                embed = message.embeds[0]
+                lines = [l for l in (embed.description or "").split("\n") if not l.startswith("Votes")]
+                lines.append(f"Votes : {votes}")
+                embed.description = "\n".join(lines)
+                try:
+                    await message.edit(embed=embed)
+                    shown = votes
+                except (discord.NotFound, discord.Forbidden):
+                    self._pending_votes.pop(message_id, None)
+                    return
+                except discord.HTTPException:
+                    pass
+                await asyncio.sleep(VOTE_EDIT_INTERVAL)
+        finally:
+            self._vote_edits.pop(message_id, None)
 
     async def _finish_challenge(
         self,
-        interaction: discord.Interaction,
+        interaction: discord.Interaction | None,
         challenge_id: ObjectId,
-        thread: discord.Thread
-    ):
-        chal = await challenges_collection.find_one({"_id": challenge_id})
+        thread: discord.Thread | None
+    ) -> bool:
+        """Termine le challenge une seule fois (bouton ou échéance) ; False s'il l'était déjà."""
+        # Drapeau posé atomiquement : le bouton et le planificateur ne peuvent pas finir deux fois
+        chal = await challenges_collection.find_one_and_update(
+            {"_id": challenge_id, "finished": {"$ne": True}},
+            {"$set": {"finished": True, "finished_at": datetime.utcnow()}}
+        )
+        if not chal:
+            return False
+        await self._finalize(chal, thread)
+        return True
+
+    async def _finalize(self, chal: dict, thread: discord.Thread | None = None):
+        """Publie les résultats, verrouille le fil puis supprime le document (rejouable sans risque)."""
         subs = chal.get("submissions", [])
         ranked = sorted(subs, key=lambda s: len(s["votes"]), reverse=True)[:3]
         medals = ["🥇", "🥈", "🥉"]
@@ -215,16 +312,35 @@ class Challenge(commands.Cog):
             for i, r in enumerate(ranked)
         ) or "Aucune participation."
 
-        original = await thread.parent.fetch_message(chal["message_id"])
-        await original.edit(
-            embed=discord.Embed(
-                title=f"Challenge {chal['name']} terminé",
-                description=desc,
-                color=EMBED_COLOR
-            )
-        )
-        await thread.edit(locked=True, archived=True)
-        await challenges_collection.delete_one({"_id": challenge_id})
+        channel = self.bot.get_channel(chal.get("channel_id"))
+        if channel and chal.get("message_id"):
+            # Message partiel : pas de fetch_message, résultats + boutons désactivés en une édition
+            original = channel.get_partial_message(chal["message_id"])
+            try:
+                await original.edit(
+                    embed=discord.Embed(
+                        title=f"Challenge {chal['name']} terminé",
+                        description=desc,
+                        color=EMBED_COLOR
+                    ),
+                    view=challenge_view(chal["_id"], disabled=True)
+                )
+            except (discord.NotFound, discord.Forbidden):
+                pass
+
+        if thread is None and chal.get("thread_id"):
+            thread = self.bot.get_channel(chal["thread_id"])
+            if thread is None:
+                try:
+                    thread = await self.bot.fetch_channel(chal["thread_id"])
+                except (discord.NotFound, discord.Forbidden):
+                    thread = None
+        if thread:
+            try:
+                await thread.edit(locked=True, archived=True)
+            except (discord.NotFound, discord.Forbidden):
+                pass
+        await challenges_collection.delete_one({"_id": chal["_id"]})
 
     @app_commands.guild_only()
     @app_commands.command(name="challenge_create", description="Créer un challenge")
@@ -273,7 +389,8 @@ class Challenge(commands.Cog):
             }}
         )
 
-        await msg.edit(view=ChallengeView(chal_id, thread))
+        await msg.edit(view=challenge_view(chal_id))
+        self.scheduler.schedule(deadline_dt, chal_id)
         await interaction.response.send_message("Challenge créé !", ephemeral=True)
 
     @app_commands.guild_only()
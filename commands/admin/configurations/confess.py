@@ -1,19 +1,27 @@
 # commands/admin/configurations/confess.py
 
 import re
+import asyncio
 import datetime
 import logging
+import os
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput
+from pymongo import ReturnDocument
 
 from config.mongo import confession_collection
+from config.cache import confession_cache, confession_blocked_cache
+from config.router import routed_view
 from config.params import EMBED_COLOR, EMBED_FOOTER_TEXT, EMBED_FOOTER_ICON_URL, MESSAGES
 
 log = logging.getLogger("elda.confession")
 
+# Délai avant de reposter le panneau : une rafale de confessions ne le reposte qu'une fois
+PANEL_REPOST_DELAY = float(os.getenv("CONFESS_PANEL_DELAY", 5))
+
 
 def parse_label_and_emoji(raw: str):
     m = re.search(r'<(a?):(\w+):(\d+)>', raw)
@@ -33,8 +41,9 @@ class ConfessionModal(Modal, title="🕯️ Confession Anonyme"):
         placeholder="Écris ta confession ici…"
     )
 
-    def __init__(self, guild_id: int, member: discord.Member):
+    def __init__(self, cog: "ConfessionCog", guild_id: int, member: discord.Member):
         super().__init__()
+        self.cog = cog
         self.guild_id = guild_id
         self.member = member
 
@@ -42,11 +51,8 @@ class ConfessionModal(Modal, title="🕯️ Confession Anonyme"):
         # 1️⃣ Defer pour éviter le “Unknown interaction”
         await interaction.response.defer(ephemeral=True)
 
-        # 2️⃣ Charger la config
-        cfg = await confession_collection.find_one({
-            "kind": "config",
-            "guild_id": self.guild_id
-        })
+        # 2️⃣ Config et bloqués servis depuis le cache (invalidés par /set_confess et /confession_settings)
+        cfg = await confession_cache.get(self.guild_id)
         if not cfg:
             log.error(f"[Modal] Pas de config pour guild {self.guild_id}")
             return await interaction.followup.send(
@@ -55,25 +61,11 @@ class ConfessionModal(Modal, title="🕯️ Confession Anonyme"):
             )
 
         # 3️⃣ Vérifier blocage
-        blocked = await confession_collection.find_one({
-            "kind": "block",
-            "guild_id": self.guild_id,
-            "user_id": self.member.id
-        })
-        if blocked:
+        if self.member.id in await confession_blocked_cache.get(self.guild_id):
             return await interaction.followup.send(
                 MESSAGES["PERMISSION_ERROR"], ephemeral=True
             )
 
-        # 4️⃣ Incrémenter le compteur
-        res = await confession_collection.find_one_and_update(
-            {"kind": "config", "guild_id": self.guild_id},
-            {"$inc": {"count": 1}},
-            return_document=True
-        )
-        num = res.get("count", 1)
-
-        # 5️⃣ Poster l’embed de la confession
         channel = interaction.guild.get_channel(cfg["channel_id"])
         if not channel:
             log.error(f"[Modal] Salon {cfg['channel_id']} introuvable en guild {self.guild_id}")
@@ -81,6 +73,22 @@ class ConfessionModal(Modal, title="🕯️ Confession Anonyme"):
                 MESSAGES["CHANNEL_NOT_FOUND"], ephemeral=True
             )
 
+        # 4️⃣ Incrémenter le compteur (seul aller-retour Mongo)
+        res = await confession_collection.find_one_and_update(
+            {"kind": "config", "guild_id": self.guild_id},
+            {"$inc": {"count": 1}},
+            projection={"count": 1, "_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if res is None:
+            confession_cache.invalidate(self.guild_id)
+            return await interaction.followup.send(
+                "⚠️ Configuration introuvable. Reconfigurez avec `/set_confess`.",
+                ephemeral=True
+            )
+        num = res["count"]
+
+        # 5️⃣ Poster l’embed de la confession
         embed = discord.Embed(
             title=f"Confession #{num}",
             description=self.confession.value,
@@ -96,51 +104,99 @@ class ConfessionModal(Modal, title="🕯️ Confession Anonyme"):
                 MESSAGES["INTERNAL_ERROR"], ephemeral=True
             )
 
-        # 6️⃣ Rafraîchir le panneau (supprimer ancien + renvoyer)
-        try:
-            if old_id := cfg.get("message_id"):
-                old = await channel.fetch_message(old_id)
-                await old.delete()
-        except discord.NotFound:
-            pass
-        except Exception:
-            log.exception("Erreur suppression ancien panneau")
+        # 6️⃣ Rafraîchir le panneau (regroupé avec les confessions qui suivent)
+        self.cog.schedule_panel_repost(interaction.guild)
 
-        view = PanelView(self.guild_id, cfg["button_label"])
-        panel = discord.Embed(
-            title="Confession Anonyme !",
-            description=f"Clique sur « {cfg['button_label']} » pour soumettre ta confession !",
-            color=EMBED_COLOR
-        )
-        panel.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
+        # ### Plus de message de confirmation ici ###
 
-        sent = await channel.send(embed=panel, view=view)
-        await confession_collection.update_one(
-            {"kind": "config", "guild_id": self.guild_id},
-            {"$set": {"message_id": sent.id}}
-        )
 
-        # ### Plus de message de confirmation ici ###
+def panel_embed(button_label: str) -> discord.Embed:
+    embed = discord.Embed(
+        title="Confession Anonyme !",
+        description=f"Clique sur « {button_label} » pour soumettre ta confession !",
+        color=EMBED_COLOR
+    )
+    embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
+    return embed
 
 
-class PanelView(View):
-    def __init__(self, guild_id: int, raw_label: str):
-        super().__init__(timeout=None)
-        label, emoji = parse_label_and_emoji(raw_label)
-        custom_id = f"confess_button:{guild_id}"
-        btn = Button(label=label, emoji=emoji, style=discord.ButtonStyle.secondary, custom_id=custom_id)
-        btn.callback = self.on_confess_button
-        self.add_item(btn)
+class ConfessButton(discord.ui.DynamicItem[Button], template=r"confess_button:(?P<guild_id>\d+)"):
+    """Bouton du panneau de confession (confess_button:<guild>) : survit aux redémarrages."""
 
-    async def on_confess_button(self, interaction: discord.Interaction):
-        await interaction.response.send_modal(
-            ConfessionModal(interaction.guild.id, interaction.user)
-        )
+    def __init__(self, guild_id: int, label: str = None, emoji=None):
+        super().__init__(Button(
+            label=label, emoji=emoji, style=discord.ButtonStyle.secondary, custom_id=f"confess_button:{guild_id}"
+        ))
+        self.guild_id = guild_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(int(match["guild_id"]), item.label, item.emoji)
+
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.client.get_cog("ConfessionCog").on_confess_button(interaction)
+
+
+def panel_view(guild_id: int, raw_label: str) -> View:
+    """Vue du panneau, à envoyer telle quelle : le clic est traité par ConfessButton."""
+    label, emoji = parse_label_and_emoji(raw_label)
+    return routed_view(ConfessButton(guild_id, label, emoji))
 
 
 class ConfessionCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # guild_id -> tâche de repost du panneau en attente
+        self._panel_reposts: dict[int, asyncio.Task] = {}
+
+    async def cog_load(self):
+        self.bot.add_dynamic_items(ConfessButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(ConfessButton)
+        for task in self._panel_reposts.values():
+            task.cancel()
+
+    async def on_confess_button(self, interaction: discord.Interaction):
+        await interaction.response.send_modal(
+            ConfessionModal(self, interaction.guild.id, interaction.user)
+        )
+
+    def schedule_panel_repost(self, guild: discord.Guild):
+        """Un seul repost par rafale : les confessions suivantes rejoignent la tâche en attente."""
+        if guild.id not in self._panel_reposts:
+            self._panel_reposts[guild.id] = asyncio.create_task(self._repost_panel(guild))
+
+    async def _repost_panel(self, guild: discord.Guild):
+        guild_id = guild.id
+        try:
+            await asyncio.sleep(PANEL_REPOST_DELAY)
+            # Salon relu à l'échéance : /set_confess a pu le changer pendant l'attente
+            cfg = await confession_cache.get(guild_id)
+            if not cfg:
+                return
+            channel = guild.get_channel(cfg["channel_id"])
+            if channel is None:
+                return
+            # Supprimer l'ancien panneau (message partiel : pas de fetch) puis le renvoyer en bas du salon
+            try:
+                if old_id := cfg.get("message_id"):
+                    await channel.get_partial_message(old_id).delete()
+            except discord.NotFound:
+                pass
+            except Exception:
+                log.exception("Erreur suppression ancien panneau")
+
+            sent = await channel.send(embed=panel_embed(cfg["button_label"]), view=panel_view(guild_id, cfg["button_label"]))
+            await confession_collection.update_one(
+                {"kind": "config", "guild_id": guild_id},
+                {"$set": {"message_id": sent.id}}
+            )
+            confession_cache.invalidate(guild_id)
+        except Exception:
+            log.exception("Erreur repost du panneau de confession (guild %s)", guild_id)
+        finally:
+            self._panel_reposts.pop(guild_id, None)
 
     @app_commands.command(
         name="set_confess",
@@ -173,19 +229,13 @@ class ConfessionCog(commands.Cog):
             upsert=True
         )
 
-        view = PanelView(interaction.guild.id, button_label)
-        embed = discord.Embed(
-            title="Confession Anonyme !",
-            description=f"Clique sur « {button_label} » pour soumettre ta confession !",
-            color=EMBED_COLOR
-        )
-        embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-        msg = await channel.send(embed=embed, view=view)
+        msg = await channel.send(embed=panel_embed(button_label), view=panel_view(interaction.guild.id, button_label))
 
         await confession_collection.update_one(
             {"kind": "config", "guild_id": interaction.guild.id},
             {"$set": {"message_id": msg.id}}
         )
+        confession_cache.invalidate(interaction.guild.id)
 
         await interaction.response.send_message(
             MESSAGES["MESSAGE_SENT"], ephemeral=True
@@ -7,6 +7,7 @@ from discord.ext import commands
 from discord.ui import View, Button
 
 from config.mongo import confession_collection
+from config.cache import confession_blocked_cache
 from config.params import EMBED_COLOR, EMBED_FOOTER_TEXT, EMBED_FOOTER_ICON_URL, MESSAGES
 
 PAGE_SIZE = 10  # Nombre d’utilisateurs listés par page
@@ -102,6 +103,7 @@ class ConfessionSettings(commands.Cog):
                 {"$set": {"timestamp": datetime.datetime.utcnow()}},
                 upsert=True
             )
+            confession_blocked_cache.invalidate(gid)
             return await interaction.response.send_message(
                 f"🚫 {user.mention} est désormais bloqué·e.", ephemeral=True
             )
@@ -111,6 +113,7 @@ class ConfessionSettings(commands.Cog):
             await confession_collection.delete_one({
                 "kind": "block", "guild_id": gid, "user_id": user.id
             })
+            confession_blocked_cache.invalidate(gid)
             return await interaction.response.send_message(
                 f"✅ {user.mention} a été débloqué·e.", ephemeral=True
             )
@@ -5,6 +5,7 @@ from discord.ui import View, ChannelSelect, Button, Select, Modal, TextInput
 
 # Import de la collection MongoDB dédiée
 from config.mongo import custom_voc_collection
+from config.cache import custom_voc_cache
 from config.params import EMBED_COLOR, EMBED_FOOTER_TEXT, EMBED_FOOTER_ICON_URL
 
 class CustomVocView(View):
@@ -89,6 +90,7 @@ class CustomVocView(View):
             {"guild_id": self.guild.id, "category_id": self.category_id, "create_channel_id": self.channel_id},
             upsert=True
         )
+        custom_voc_cache.invalidate(self.guild.id)
         embed = discord.Embed(
             title="✅ Configuration enregistrée",
             description=(
@@ -102,6 +104,7 @@ class CustomVocView(View):
 
     async def on_delete_clicked(self, interaction: discord.Interaction):
         await custom_voc_collection.delete_one({"guild_id": self.guild.id})
+        custom_voc_cache.invalidate(self.guild.id)
         embed = discord.Embed(
             title="🗑️ Configuration supprimée",
             description="La configuration Custom Voc a été réinitialisée. Vous pouvez en créer une nouvelle.",
@@ -194,7 +197,7 @@ class CustomVocCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before, after):
-        config = await custom_voc_collection.find_one({"guild_id": member.guild.id})
+        config = await custom_voc_cache.get(member.guild.id)
         if not config:
             return
         # Création et transfert
@@ -13,6 +13,7 @@ from config.params import (
     EMOJIS,
 )
 from config.mongo import images_only_collection
+from config.cache import images_only_cache
 
 
 class ImagesOnlyView(View):
@@ -103,6 +104,7 @@ class ImagesOnlyView(View):
             await images_only_collection.update_one(
                 {"_id": self.guild.id}, {"$set": {"channels": new_list}}, upsert=True
             )
+            images_only_cache.invalidate(self.guild.id)
         except:
             return await interaction.response.send_message("❌ Erreur base de données.", ephemeral=True)
         self.existing = new_list
@@ -119,6 +121,7 @@ class ImagesOnlyView(View):
             await images_only_collection.update_one(
                 {"_id": self.guild.id}, {"$set": {"channels": new_list}}
             )
+            images_only_cache.invalidate(self.guild.id)
         except:
             return await interaction.response.send_message("❌ Erreur base de données.", ephemeral=True)
         self.existing = new_list
@@ -132,6 +135,7 @@ class ImagesOnlyView(View):
             return await interaction.response.send_message(MESSAGES["PERMISSION_ERROR"], ephemeral=True)
         try:
             await images_only_collection.delete_one({"_id": self.guild.id})
+            images_only_cache.invalidate(self.guild.id)
         except:
             return await interaction.response.send_message("❌ Erreur base de données.", ephemeral=True)
         self.existing = []
@@ -217,7 +221,7 @@ class ImagesOnly(commands.Cog):
         if perms.administrator or perms.manage_messages:
             return
         try:
-            config = await images_only_collection.find_one({"_id": message.guild.id})
+            config = await images_only_cache.get(message.guild.id)
         except:
             return
         if not config or message.channel.id not in config.get("channels", []):
@@ -240,6 +244,7 @@ class ImagesOnly(commands.Cog):
     async def on_guild_remove(self, guild: discord.Guild):
         try:
             await images_only_collection.delete_one({"_id": guild.id})
+            images_only_cache.invalidate(guild.id)
         except:
             pass
 
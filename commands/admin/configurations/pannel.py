@@ -1,8 +1,11 @@
+import datetime
+import logging
+
 import discord
 from discord import app_commands
 from discord.ext import commands
-from discord.ui import View, Button, button
-from pymongo import ReturnDocument
+from discord.ui import View, Button
+from pymongo import ReturnDocument, UpdateOne
 from config.params import (
     EMBED_COLOR,
     EMBED_FOOTER_TEXT,
@@ -10,13 +13,121 @@ from config.params import (
     MESSAGES,
     EMOJIS,
 )
-from config.mongo import soutien_collection
-import io
+from config.mongo import soutien_collection, ticket_collection
+from config.cache import ticket_config_cache
+from config.router import routed_view
+from config.transcript import write_transcript
+
+log = logging.getLogger("elda.tickets")
+
+# Champs de la config ticket anciennement rangés dans soutien_collection
+LEGACY_CONFIG_FIELDS = (
+    "panel_channel_id", "transcript_channel_id", "category_id",
+    "support_roles", "ticket_counter", "panel_message_id", "transcript_format",
+)
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+def is_support(member: discord.Member, config: dict) -> bool:
+    """Administrateur, ou au moins un rôle en commun avec les rôles support de la config."""
+    if member.guild_permissions.administrator:
+        return True
+    return not set(config.get("support_roles", ())).isdisjoint(r.id for r in member.roles)
+
+
+# action -> (label, style) des boutons de ticket
+_TICKET_BUTTONS = {
+    "create": (None, discord.ButtonStyle.primary),
+    "claim": ("Claim", discord.ButtonStyle.secondary),
+    "close": ("Close", discord.ButtonStyle.danger),
+    "reopen": ("Reopen", discord.ButtonStyle.success),
+    "delete": ("Delete", discord.ButtonStyle.danger),
+    "confirm_delete": ("Confirmer", discord.ButtonStyle.danger),
+    "cancel_delete": ("Annuler", discord.ButtonStyle.secondary),
+}
+
+
+class TicketButton(
+    discord.ui.DynamicItem[Button],
+    template=(
+        r"ticket:(?P<action>create|claim|close|reopen|delete|confirm_delete|cancel_delete)"
+        # Boutons postés avant ticket:<action> (custom_ids fixes)
+        r"|(?P<legacy>create|claim|close|reopen|delete)_ticket"
+        r"|(?P<legacy_confirm>confirm_delete|cancel_delete)"
+    )
+):
+    """Boutons de ticket (ticket:<action>) ; le ticket est retrouvé par l'identifiant du salon."""
+
+    def __init__(self, action: str, emoji=None, custom_id: str = None):
+        label, style = _TICKET_BUTTONS[action]
+        super().__init__(Button(label=label, emoji=emoji, style=style, custom_id=custom_id or f"ticket:{action}"))
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        action = match["action"] or match["legacy"] or match["legacy_confirm"]
+        return cls(action, item.emoji, item.custom_id)
+
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.client.get_cog("TicketConfigCog").on_ticket_button(interaction, self.action)
+
+
+def panel_view() -> View:
+    return routed_view(TicketButton("create", EMOJIS.get('TICKET', '<:ticket:1390855520533090355>')))
+
+
+def ticket_action_view() -> View:
+    """Boutons du message d'accueil."""
+    return routed_view(*(TicketButton(action) for action in ("claim", "close", "reopen", "delete")))
+
+
+def delete_confirm_view() -> View:
+    return routed_view(TicketButton("confirm_delete"), TicketButton("cancel_delete"))
+
+
+def _fmt_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "—"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 48:
+        return f"{hours} h {minutes:02d}"
+    return f"{hours // 24} j {hours % 24} h"
+
 
 class TicketConfigCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+    async def cog_load(self):
+        self.bot.add_dynamic_items(TicketButton)
+        await self._migrate_legacy_configs()
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(TicketButton)
+
+    async def _migrate_legacy_configs(self):
+        """Déplace les configs ticket de soutien_collection vers ticket_collection (une seule fois)."""
+        ops, legacy_ids = [], []
+        async for doc in soutien_collection.find({"ticket_counter": {"$exists": True}}):
+            fields = {k: doc[k] for k in LEGACY_CONFIG_FIELDS if k in doc}
+            ops.append(UpdateOne(
+                {"kind": "config", "guild_id": doc["guild_id"]},
+                {"$setOnInsert": fields},
+                upsert=True
+            ))
+            legacy_ids.append(doc["_id"])
+        if not ops:
+            return
+        await ticket_collection.bulk_write(ops, ordered=False)
+        await soutien_collection.delete_many({"_id": {"$in": legacy_ids}})
+        log.info("%d configuration(s) ticket migrée(s) hors de soutien", len(ops))
+
     @app_commands.command(name="ticket-config")
     @app_commands.default_permissions(administrator=True)
     @app_commands.checks.has_permissions(administrator=True)
@@ -24,8 +135,13 @@ class TicketConfigCog(commands.Cog):
         panel="Salon où poster le panneau de création de ticket",
         transcript="Salon pour les transcriptions",
         category="Catégorie où créer les tickets",
-        support_roles="Rôles à qui donner accès (mentionnés séparés par espace)"
+        support_roles="Rôles à qui donner accès (mentionnés séparés par espace)",
+        transcript_format="Format des transcriptions (HTML par défaut)"
     )
+    @app_commands.choices(transcript_format=[
+        app_commands.Choice(name="HTML", value="html"),
+        app_commands.Choice(name="Texte", value="txt"),
+    ])
     async def ticket_config(
         self,
         interaction: discord.Interaction,
@@ -33,6 +149,7 @@ class TicketConfigCog(commands.Cog):
         transcript: discord.TextChannel,
         category: discord.CategoryChannel,
         support_roles: str,
+        transcript_format: app_commands.Choice[str] = None,
     ):
         guild_id = interaction.guild.id
 
@@ -55,13 +172,14 @@ class TicketConfigCog(commands.Cog):
             '$set': {
                 'panel_channel_id': panel.id,
                 'transcript_channel_id': transcript.id,
-                'category_id': category.id
+                'category_id': category.id,
+                'transcript_format': transcript_format.value if transcript_format else 'html'
             },
             '$addToSet': {'support_roles': {'$each': role_ids}},
             '$setOnInsert': {'ticket_counter': 0}
         }
-        config = await soutien_collection.find_one_and_update(
-            {'guild_id': guild_id},
+        config = await ticket_collection.find_one_and_update(
+            {'kind': 'config', 'guild_id': guild_id},
             update,
             upsert=True,
             return_document=ReturnDocument.AFTER
@@ -85,33 +203,138 @@ class TicketConfigCog(commands.Cog):
             color=EMBED_COLOR
         )
         embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-        view = TicketPanelView(self.bot)
-        msg = await panel.send(embed=embed, view=view)
-        await soutien_collection.update_one(
-            {'guild_id': guild_id},
+        msg = await panel.send(embed=embed, view=panel_view())
+        await ticket_collection.update_one(
+            {'kind': 'config', 'guild_id': guild_id},
             {'$set': {'panel_message_id': msg.id}}
         )
+        ticket_config_cache.invalidate(guild_id)
 
         await interaction.response.send_message(
             "✅ Configuration enregistrée et panneau mis à jour.", ephemeral=True
         )
 
+    @app_commands.command(name="ticket-stats", description="Tickets ouverts et délais de prise en charge / fermeture.")
+    @app_commands.default_permissions(manage_channels=True)
+    @app_commands.describe(days="Période analysée, en jours (30 par défaut)")
+    async def ticket_stats(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, 365] = 30):
+        guild_id = interaction.guild.id
+        since = _now() - datetime.timedelta(days=days)
+
+        # Une agrégation : états courants de tous les tickets + délais des tickets créés sur la période
+        pipeline = [
+            {"$match": {"kind": "ticket", "guild_id": guild_id}},
+            {"$facet": {
+                "states": [
+                    {"$match": {"state": {"$in": ["open", "closed"]}}},
+                    {"$group": {"_id": "$state", "n": {"$sum": 1}}},
+                ],
+                "sla": [
+                    {"$match": {"created_at": {"$gte": since}}},
+                    {"$group": {
+                        "_id": None,
+                        "created": {"$sum": 1},
+                        "claimed": {"$sum": {"$cond": [{"$ifNull": ["$claimed_at", False]}, 1, 0]}},
+                        "closed": {"$sum": {"$cond": [{"$ifNull": ["$closed_at", False]}, 1, 0]}},
+                        "avg_claim_ms": {"$avg": {"$subtract": ["$claimed_at", "$created_at"]}},
+                        "max_claim_ms": {"$max": {"$subtract": ["$claimed_at", "$created_at"]}},
+                        "avg_close_ms": {"$avg": {"$subtract": ["$closed_at", "$created_at"]}},
+                        "max_close_ms": {"$max": {"$subtract": ["$closed_at", "$created_at"]}},
+                    }},
+                ],
+            }},
+        ]
+        result = (await ticket_collection.aggregate(pipeline).to_list(1))[0]
+        states = {row["_id"]: row["n"] for row in result["states"]}
+        sla = result["sla"][0] if result["sla"] else {}
 
-class TicketPanelView(View):
-    def __init__(self, bot: commands.Bot):
-        super().__init__(timeout=None)
-        self.bot = bot
+        def seconds(key):
+            value = sla.get(key)
+            return value / 1000 if value is not None else None
 
-    @button(emoji=EMOJIS.get('TICKET', '<:ticket:1390855520533090355>'),
-            style=discord.ButtonStyle.primary, custom_id="create_ticket")
-    async def create_ticket(self, interaction: discord.Interaction, button: Button):
+        embed = discord.Embed(title="🎫 Statistiques des tickets", color=EMBED_COLOR)
+        embed.add_field(name="Ouverts", value=str(states.get("open", 0)), inline=True)
+        embed.add_field(name="Fermés (non supprimés)", value=str(states.get("closed", 0)), inline=True)
+        embed.add_field(
+            name=f"Créés ({days} j)",
+            value=f"{sla.get('created', 0)} • claim : {sla.get('claimed', 0)} • fermés : {sla.get('closed', 0)}",
+            inline=False
+        )
+        embed.add_field(
+            name="⏱️ Délai de claim",
+            value=f"moyen {_fmt_duration(seconds('avg_claim_ms'))} • max {_fmt_duration(seconds('max_claim_ms'))}",
+            inline=True
+        )
+        embed.add_field(
+            name="🔒 Délai de fermeture",
+            value=f"moyen {_fmt_duration(seconds('avg_close_ms'))} • max {_fmt_duration(seconds('max_close_ms'))}",
+            inline=True
+        )
+        embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    # --- Boutons (ticket:<action>) ---
+
+    async def on_ticket_button(self, interaction: discord.Interaction, action: str):
+        config = await ticket_config_cache.get(interaction.guild.id)
+        if not config:
+            return await interaction.response.send_message(
+                "⚠️ Le système de tickets n'est pas configuré (`/ticket-config`).", ephemeral=True
+            )
+        if action == "create":
+            return await self.create_ticket(interaction, config)
+        if action == "cancel_delete":
+            return await interaction.response.send_message("Suppression annulée.", ephemeral=True)
+
+        ticket = await self._get_ticket(interaction.channel)
+        if ticket is None:
+            return await interaction.response.send_message("Ce salon n'est pas un ticket.", ephemeral=True)
+        handler = {
+            "claim": self.claim,
+            "close": self.close,
+            "reopen": self.reopen,
+            "delete": self.delete,
+            "confirm_delete": self.confirm_delete,
+        }[action]
+        await handler(interaction, config, ticket)
+
+    async def _get_ticket(self, channel: discord.abc.GuildChannel) -> dict | None:
+        ticket = await ticket_collection.find_one({"kind": "ticket", "channel_id": channel.id})
+        if ticket is not None or not (channel.topic or "").startswith("Ticket "):
+            return ticket
+        # Ticket ouvert avant le registre : l'ouvreur n'est connu que par le sujet du salon
+        try:
+            opener_id = int(channel.topic.split()[-1])
+        except ValueError:
+            return None
+        ticket = {
+            "kind": "ticket",
+            "guild_id": channel.guild.id,
+            "channel_id": channel.id,
+            "number": None,
+            "opener_id": opener_id,
+            "state": "open",
+            "claimer_id": None,
+            "created_at": channel.created_at.replace(tzinfo=None),
+            "claimed_at": None,
+            "closed_at": None,
+        }
+        await ticket_collection.update_one(
+            {"kind": "ticket", "channel_id": channel.id}, {"$setOnInsert": ticket}, upsert=True
+        )
+        return ticket
+
+    async def create_ticket(self, interaction: discord.Interaction, config: dict):
+        # Création du salon + insertion + pin dépassent souvent les 3 s du premier accusé de réception
+        await interaction.response.defer(ephemeral=True)
         guild_id = interaction.guild.id
-        config = await soutien_collection.find_one_and_update(
-            {'guild_id': guild_id},
+        counter = await ticket_collection.find_one_and_update(
+            {'kind': 'config', 'guild_id': guild_id},
             {'$inc': {'ticket_counter': 1}},
+            projection={'ticket_counter': 1},
             return_document=ReturnDocument.AFTER
         )
-        count = config['ticket_counter']
+        count = counter['ticket_counter']
         name = f"{count:03d}-{interaction.user.name}"
         category = discord.utils.get(interaction.guild.categories, id=config['category_id'])
         # Permissions
@@ -135,6 +358,18 @@ class TicketPanelView(View):
             overwrites=overwrites,
             topic=f"Ticket {name} créé par {interaction.user.id}"
         )
+        await ticket_collection.insert_one({
+            "kind": "ticket",
+            "guild_id": guild_id,
+            "channel_id": channel.id,
+            "number": count,
+            "opener_id": interaction.user.id,
+            "state": "open",
+            "claimer_id": None,
+            "created_at": _now(),
+            "claimed_at": None,
+            "closed_at": None,
+        })
 
         # Embed d'accueil et pin
         embed = discord.Embed(
@@ -149,87 +384,111 @@ class TicketPanelView(View):
         )
         embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
         mentions = ' '.join(f'<@&{r}>' for r in config['support_roles'])
-        view = TicketActionView(config)
-        welcome = await channel.send(mentions, embed=embed, view=view)
+        welcome = await channel.send(mentions, embed=embed, view=ticket_action_view())
         await welcome.pin()
 
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"✅ Ticket créé : {channel.mention}", ephemeral=True
         )
 
-
-class TicketActionView(View):
-    def __init__(self, config: dict):
-        super().__init__(timeout=None)
-        self.config = config
-
-    @button(label="Claim", style=discord.ButtonStyle.secondary, custom_id="claim_ticket")
-    async def claim(self, interaction: discord.Interaction, button: Button):
-        if not any(r.id in self.config['support_roles'] for r in interaction.user.roles) \
-           and not interaction.user.guild_permissions.administrator:
+    async def claim(self, interaction: discord.Interaction, config: dict, ticket: dict):
+        if not is_support(interaction.user, config):
             return await interaction.response.send_message(
                 MESSAGES['PERMISSION_ERROR'], ephemeral=True
             )
+        # Premier claim seulement : le délai de prise en charge reste celui du premier support
+        claimed = await ticket_collection.find_one_and_update(
+            {"kind": "ticket", "channel_id": ticket["channel_id"], "claimer_id": None},
+            {"$set": {"claimer_id": interaction.user.id, "claimed_at": _now()}}
+        )
+        if claimed is None:
+            # `ticket` a été lu avant le claim concurrent : relit le claimer réel
+            current = await ticket_collection.find_one(
+                {"kind": "ticket", "channel_id": ticket["channel_id"]}, {"claimer_id": 1}
+            )
+            claimer_id = current and current.get("claimer_id")
+            return await interaction.response.send_message(
+                f"Ce ticket est déjà claim par <@{claimer_id}>." if claimer_id else "Ce ticket est déjà claim.",
+                ephemeral=True
+            )
         await interaction.channel.send(f"{interaction.user.mention} a claim ce ticket.")
         await interaction.response.defer()
 
-    @button(label="Close", style=discord.ButtonStyle.danger, custom_id="close_ticket")
-    async def close(self, interaction: discord.Interaction, button: Button):
-        opener_id = int(interaction.channel.topic.split()[-1])
-        opener = interaction.guild.get_member(opener_id)
+    async def close(self, interaction: discord.Interaction, config: dict, ticket: dict):
+        opener = interaction.guild.get_member(ticket["opener_id"])
         if opener:
             await interaction.channel.set_permissions(opener, view_channel=False)
+        await ticket_collection.update_one(
+            {"kind": "ticket", "channel_id": ticket["channel_id"]},
+            {"$set": {"state": "closed", "closed_at": _now()}}
+        )
         await interaction.channel.send("🔒 Ticket fermé. Seuls les supports peuvent continuer.")
         await interaction.response.defer()
 
-    @button(label="Reopen", style=discord.ButtonStyle.success, custom_id="reopen_ticket")
-    async def reopen(self, interaction: discord.Interaction, button: Button):
-        opener_id = int(interaction.channel.topic.split()[-1])
-        opener = interaction.guild.get_member(opener_id)
+    async def reopen(self, interaction: discord.Interaction, config: dict, ticket: dict):
+        opener = interaction.guild.get_member(ticket["opener_id"])
         if opener:
             await interaction.channel.set_permissions(opener, view_channel=True)
+        await ticket_collection.update_one(
+            {"kind": "ticket", "channel_id": ticket["channel_id"]},
+            {"$set": {"state": "open", "reopened_at": _now()}, "$unset": {"closed_at": ""}}
+        )
         await interaction.channel.send("🔓 Ticket rouvert. Accès rétabli.")
         await interaction.response.defer()
 
-    @button(label="Delete", style=discord.ButtonStyle.danger, custom_id="delete_ticket")
-    async def delete(self, interaction: discord.Interaction, button: Button):
+    async def delete(self, interaction: discord.Interaction, config: dict, ticket: dict):
         await interaction.response.send_message(
-            "⚠️ Confirmez la suppression ?", view=DeleteConfirmView(self.config), ephemeral=True
+            "⚠️ Confirmez la suppression ?", view=delete_confirm_view(), ephemeral=True
         )
 
-
-class DeleteConfirmView(View):
-    def __init__(self, config: dict):
-        super().__init__(timeout=None)
-        self.config = config
-
-    @button(label="Confirmer", style=discord.ButtonStyle.danger, custom_id="confirm_delete")
-    async def confirm(self, interaction: discord.Interaction, button: Button):
+    async def confirm_delete(self, interaction: discord.Interaction, config: dict, ticket: dict):
+        await interaction.response.defer(ephemeral=True)
         channel = interaction.channel
-        transcript_ch = interaction.guild.get_channel(self.config['transcript_channel_id'])
-        # Génération du transcript
-        buffer = io.StringIO()
-        async for msg in channel.history(limit=None, oldest_first=True):
-            buffer.write(f"[{msg.created_at.isoformat()}] {msg.author}: {msg.content}\n")
-        buffer.seek(0)
-        file = discord.File(fp=buffer, filename=f"{channel.name}_transcript.txt")
-        embed = discord.Embed(
-            title="📝 Transcription de ticket",
-            description=(
-                f"Ouvreur : <@{channel.topic.split()[-1]}>\n"
-                f"Channel : {channel.name}\n"
-            ),
-            color=EMBED_COLOR
+        transcript_ch = interaction.guild.get_channel(config['transcript_channel_id'])
+        # Génération du transcript (fichier temporaire, écrit au fil de l'historique)
+        transcript = await write_transcript(channel, config.get('transcript_format', 'html'))
+        try:
+            embed = discord.Embed(
+                title="📝 Transcription de ticket",
+                description=(
+                    f"Ouvreur : <@{ticket['opener_id']}>\n"
+                    f"Channel : {channel.name}\n"
+                    f"Messages : {transcript.messages} • Pièces jointes : {transcript.attachments}\n"
+                ),
+                color=EMBED_COLOR
+            )
+            embed.set_footer(
+                text=f"{EMBED_FOOTER_TEXT} • généré en {transcript.seconds:.1f}s",
+                icon_url=EMBED_FOOTER_ICON_URL
+            )
+            if transcript_ch:
+                if transcript.size <= interaction.guild.filesize_limit:
+                    await transcript_ch.send(
+                        embed=embed, file=discord.File(transcript.path, filename=transcript.filename)
+                    )
+                else:
+                    embed.add_field(
+                        name="⚠️ Fichier non joint",
+                        value=f"Transcription trop volumineuse ({transcript.size // 1024} Ko).",
+                        inline=False
+                    )
+                    await transcript_ch.send(embed=embed)
+        finally:
+            transcript.cleanup()
+
+        now = _now()
+        await ticket_collection.update_one(
+            {"kind": "ticket", "channel_id": channel.id},
+            {"$set": {
+                "state": "deleted",
+                "deleted_at": now,
+                "closed_at": ticket.get("closed_at") or now,
+                "messages": transcript.messages,
+            }}
         )
-        embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-        if transcript_ch:
-            await transcript_ch.send(embed=embed, file=file)
+        # Confirmation avant la suppression : le followup est envoyé dans ce salon
+        await interaction.followup.send("Le ticket va être supprimé.", ephemeral=True)
         await channel.delete()
-        await interaction.followup.send("Le ticket a été supprimé.", ephemeral=True)
-
-    @button(label="Annuler", style=discord.ButtonStyle.secondary, custom_id="cancel_delete")
-    async def cancel(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.send_message("Suppression annulée.", ephemeral=True)
 
 
 async def setup(bot: commands.Bot):
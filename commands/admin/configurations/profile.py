@@ -1,66 +1,123 @@
 import asyncio
-import discord
+import datetime
+import logging
 import os
-import base64                             # ← pour l’encodage Base64
+import discord
 from discord import File, Embed
 from discord.ext import commands, tasks
 from discord import app_commands
 from io import BytesIO
-import jinja2
-from playwright.async_api import async_playwright
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, UpdateOne
 
 from config.mongo import profile_collection
-
-# --- Setup Jinja2 for HTML template ---
-template_env = jinja2.Environment(
-    loader=jinja2.FileSystemLoader("templates"),
-    autoescape=jinja2.select_autoescape(["html"]),
-    trim_blocks=True,
-    lstrip_blocks=True
-)
-template = template_env.get_template("profile_template.html")
-
-
-async def render_profile_to_image(data: dict) -> BytesIO:
-    """Rendu du template HTML en PNG, avec le background encodé en Base64."""
-    # 1) Encoder eldabot.jpeg en Base64
-    img_path = os.path.join(os.getcwd(), "assets", "eldabot.jpeg")
-    with open(img_path, "rb") as imgf:
-        background_b64 = base64.b64encode(imgf.read()).decode("utf-8")
-
-    # 2) Génération du HTML depuis Jinja, en passant la chaîne Base64
-    html = template.render(
-        avatar_url=data.get("avatar_url", ""),
-        nickname=data.get("nickname") or "inconnu",
-        age=data.get("age") or "inconnu",
-        gender=data.get("gender") or "inconnu",
-        pronoun=data.get("pronoun") or "inconnu",
-        birthday=data.get("birthday") or "inconnu",
-        description=data.get("description") or "aucune",
-        background_base64=background_b64
+from config.render import render_pool, RenderCache, template_version, static_assets
+from config.router import routed_view
+
+log = logging.getLogger("elda.profile")
+
+PROFILE_TEMPLATE = "profile_template.html"
+BACKGROUND_ASSET = "eldabot.jpeg"
+
+# Republication : chaque profil est reposté au plus une fois par intervalle, par petits lots
+REPUBLISH_INTERVAL     = datetime.timedelta(hours=float(os.getenv("PROFILE_REPUBLISH_HOURS", 24)))
+REPUBLISH_TICK_MINUTES = float(os.getenv("PROFILE_REPUBLISH_TICK_MINUTES", 30))
+REPUBLISH_GUILD_BUDGET = int(os.getenv("PROFILE_REPUBLISH_BUDGET", 10))   # profils par serveur et par tick
+
+# PNG des cartes de profil, indexés par empreinte du contenu ; owner = (guild_id, user_id)
+profile_card_cache = RenderCache()
+
+
+def profile_card_fields(data: dict) -> tuple[str, dict]:
+    """(empreinte, champs affichés) d'une carte de profil."""
+    fields = {
+        "avatar_url": data.get("avatar_url", ""),
+        "nickname": data.get("nickname") or "inconnu",
+        "age": data.get("age") or "inconnu",
+        "gender": data.get("gender") or "inconnu",
+        "pronoun": data.get("pronoun") or "inconnu",
+        "birthday": data.get("birthday") or "inconnu",
+        "description": data.get("description") or "aucune",
+    }
+    key = RenderCache.key(
+        template_version(PROFILE_TEMPLATE), static_assets.version(BACKGROUND_ASSET), fields
     )
+    return key, fields
+
 
-    # 3) Rendu avec Playwright (pas de <base> ni url=… nécessaire)
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch()
-        page = await browser.new_page(viewport={"width": 600, "height": 350})
-        await page.set_content(html, wait_until="networkidle")
+async def render_profile_to_image(data: dict, owner: tuple[int, int] | None = None) -> BytesIO:
+    """Rendu du template HTML en PNG (mis en cache) ; le fond est servi par le pool de rendu."""
+    key, fields = profile_card_fields(data)
+    png = await profile_card_cache.get(key)
 
-        png = await page.screenshot(
-            omit_background=False,
-            clip={"x": 0, "y": 0, "width": 600, "height": 350}
+    if png is None:
+        # Rendu via le pool Chromium partagé (template Jinja)
+        png = await render_pool.render(
+            PROFILE_TEMPLATE,
+            fields,
+            viewport={"width": 600, "height": 350},
+            clip={"x": 0, "y": 0, "width": 600, "height": 350},
         )
-        await browser.close()
+        await profile_card_cache.put(key, png, owner=owner)
 
     buf = BytesIO(png)
     buf.seek(0)
     return buf
 
 
+def like_emoji(cfg: dict):
+    emoji_str = cfg.get("emoji", "💖")
+    try:
+        return discord.PartialEmoji.from_str(emoji_str)
+    except Exception:
+        return emoji_str
 
 
+def like_view(guild_id: int, owner_id: int, emoji) -> discord.ui.View:
+    """
+    Vue à joindre au message du profil. Elle est arrêtée avant l'envoi : les clics passent
+    par le DynamicItem LikeButton, rien n'est gardé en mémoire par message.
+    """
+    return routed_view(LikeButton(guild_id, owner_id, emoji))
+
+
+def like_reply_view(owner_id: int, liker_id: int, disabled: bool = False) -> discord.ui.View:
+    """Accepter / Refuser envoyés en DM au propriétaire du profil (DynamicItem LikeReplyButton)."""
+    return routed_view(
+        LikeReplyButton(owner_id, liker_id, "accept", disabled),
+        LikeReplyButton(owner_id, liker_id, "refuse", disabled),
+    )
+
 
+async def publish_profile(guild: discord.Guild, cfg: dict, doc: dict, member: discord.Member) -> bool:
+    """
+    Poste la carte du profil dans le salon de son genre et enregistre le marqueur de publication.
+    Un échec (salon absent, erreur Discord ou de rendu) est enregistré aussi : `published_at` avance
+    et `publish_failed_at` est posé, le profil ne revient qu'après REPUBLISH_INTERVAL.
+    """
+    query = {"guild_id": guild.id, "user_id": member.id}
+    now = datetime.datetime.utcnow()
+    channel = guild.get_channel(cfg.get(f"{doc.get('gender')}_channel"))
+    try:
+        if not channel:
+            raise RuntimeError(f"salon {doc.get('gender')!r} non configuré")
+        data = {**doc, "avatar_url": member.display_avatar.url}
+        key, _ = profile_card_fields(data)
+        buf = await render_profile_to_image(data, owner=(guild.id, member.id))
+        msg = await channel.send(file=File(buf, "profile.png"), view=like_view(guild.id, member.id, like_emoji(cfg)))
+    except (discord.HTTPException, RuntimeError) as e:
+        log.warning("Publication du profil %s/%s impossible : %s", guild.id, member.id, e)
+        await profile_collection.update_one(
+            query, {"$set": {"published_at": now, "publish_failed_at": now}, "$unset": {"dirty": ""}}
+        )
+        return False
+    await profile_collection.update_one(
+        query,
+        {
+            "$set": {"published_at": now, "published_hash": key, "published_message_id": msg.id},
+            "$unset": {"dirty": "", "publish_failed_at": ""},
+        }
+    )
+    return True
 
 
 class CreateProfileModal(discord.ui.Modal, title="Créer / Modifier votre profil"):
@@ -121,10 +178,11 @@ class GenderSelectView(discord.ui.View):
         self.data["gender"] = select.values[0]
 
         if self.is_modify:
-            # Modification
+            # Modification : l'ancienne carte en cache n'est plus valable
+            await profile_card_cache.invalidate((guild.id, user.id))
             await profile_collection.find_one_and_update(
                 {"guild_id": guild.id, "user_id": user.id},
-                {"$set": self.data},
+                {"$set": {**self.data, "dirty": True}},
                 return_document=ReturnDocument.AFTER
             )
             await interaction.followup.send("✅ Votre profil a été **modifié** !", ephemeral=True)
@@ -137,19 +195,9 @@ class GenderSelectView(discord.ui.View):
             await interaction.followup.send("✅ Votre profil a été créé !", ephemeral=True)
 
         # Génération et envoi de l'image dans le salon configuré
-        buf = await render_profile_to_image({"avatar_url": user.display_avatar.url, **self.data})
         cfg = await profile_collection.find_one({"_id": f"config_{guild.id}"})
-        channel_id = cfg.get(f"{self.data['gender']}_channel")
-        channel = guild.get_channel(channel_id)
-        emoji_str = cfg.get("emoji", "💖")
-        try:
-            emoji_obj = discord.PartialEmoji.from_str(emoji_str)
-        except:
-            emoji_obj = emoji_str
-
-        like_view = LikeView(self.bot, guild.id, user.id, emoji_obj)
-        msg = await channel.send(file=File(buf, "profile.png"), view=like_view)
-        self.bot.add_view(like_view, message_id=msg.id)
+        if cfg:
+            await publish_profile(guild, cfg, {**self.data, "guild_id": guild.id, "user_id": user.id}, user)
 
 
 
@@ -180,6 +228,7 @@ class ProfileActionsView(discord.ui.View):
         })
         if res.deleted_count == 0:
             return await interaction.response.send_message("❌ Pas de profil à supprimer.", ephemeral=True)
+        await profile_card_cache.invalidate((interaction.guild.id, interaction.user.id))
         await interaction.response.send_message("🗑️ Profil supprimé.", ephemeral=True)
 
 
@@ -250,77 +299,79 @@ class ProfileSetupView(discord.ui.View):
         await interaction.followup.send(f"✅ Configuration terminée avec l'emoji : {emoji}", ephemeral=True)
 
 
-class LikeView(discord.ui.View):
-    def __init__(self, bot: commands.Bot, guild_id: int, owner_id: int, emoji):
-        super().__init__(timeout=None)
-        self.bot = bot
+class LikeButton(discord.ui.DynamicItem[discord.ui.Button], template=r"like:(?P<guild_id>\d+):(?P<owner_id>\d+)"):
+    """Bouton like de toutes les cartes de profil, routé par son custom_id (anciens messages compris)."""
+
+    def __init__(self, guild_id: int, owner_id: int, emoji=None):
+        super().__init__(discord.ui.Button(
+            style=discord.ButtonStyle.secondary, emoji=emoji, custom_id=f"like:{guild_id}:{owner_id}"
+        ))
         self.guild_id = guild_id
         self.owner_id = owner_id
-        button = discord.ui.Button(style=discord.ButtonStyle.secondary, emoji=emoji, custom_id=f"like:{guild_id}:{owner_id}")
-        button.callback = self.on_like
-        self.add_item(button)
 
-    async def on_like(self, interaction: discord.Interaction):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["guild_id"]), int(match["owner_id"]), item.emoji)
+
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
         await interaction.response.defer(ephemeral=True)
         liker = interaction.user
         if liker.id == self.owner_id:
             return await interaction.followup.send("❌ Vous ne pouvez pas liker votre propre profil.", ephemeral=True)
-        if not await profile_collection.find_one({"guild_id": self.guild_id, "user_id": liker.id}):
+        liker_doc = await profile_collection.find_one({"guild_id": self.guild_id, "user_id": liker.id})
+        if not liker_doc:
             return await interaction.followup.send("❌ Vous devez avoir un profil pour liker.", ephemeral=True)
-        buffer = await render_profile_to_image({
-            "avatar_url": liker.display_avatar.url,
-            **await profile_collection.find_one({"guild_id": self.guild_id, "user_id": liker.id})
-        })
-        guild = self.bot.get_guild(self.guild_id)
+        buffer = await render_profile_to_image(
+            {"avatar_url": liker.display_avatar.url, **liker_doc}, owner=(self.guild_id, liker.id)
+        )
+        guild = bot.get_guild(self.guild_id)
         owner = guild.get_member(self.owner_id) or await guild.fetch_member(self.owner_id)
         dm = await owner.create_dm()
-        ar_view = AcceptRejectView(self.bot, self.guild_id, self.owner_id, liker.id)
-        msg = await dm.send(
+        await dm.send(
             content=f"💌 Votre profil a été liké par **{liker.display_name}**.",
-            file=File(buffer, "like.png"), view=ar_view
+            file=File(buffer, "like.png"), view=like_reply_view(self.owner_id, liker.id)
         )
-        self.bot.add_view(ar_view, message_id=msg.id)
         await interaction.followup.send("👍 Like envoyé !", ephemeral=True)
 
 
-class AcceptRejectView(discord.ui.View):
-    def __init__(self, bot: commands.Bot, guild_id: int, owner_id: int, liker_id: int):
-        super().__init__(timeout=None)
-        self.bot = bot
-        self.guild_id = guild_id
+class LikeReplyButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"likereply:(?P<owner_id>\d+):(?P<liker_id>\d+):(?P<action>accept|refuse)"
+):
+    """Accepter / Refuser un like, en DM ; fonctionne après un redémarrage sans add_view par message."""
+
+    def __init__(self, owner_id: int, liker_id: int, action: str, disabled: bool = False):
+        accept = action == "accept"
+        super().__init__(discord.ui.Button(
+            label="Accepter" if accept else "Refuser",
+            style=discord.ButtonStyle.success if accept else discord.ButtonStyle.danger,
+            disabled=disabled,
+            custom_id=f"likereply:{owner_id}:{liker_id}:{action}"
+        ))
         self.owner_id = owner_id
         self.liker_id = liker_id
+        self.action = action
 
-    @discord.ui.button(label="Accepter", style=discord.ButtonStyle.success, custom_id="accept")
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.owner_id:
-            return await interaction.response.send_message("❌ Non autorisé.", ephemeral=True)
-        owner = await self.bot.fetch_user(self.owner_id)
-        liker = await self.bot.fetch_user(self.liker_id)
-        owner_dm = await owner.create_dm()
-        liker_dm = await liker.create_dm()
-        await liker_dm.send(f"✅ **{owner.name}#{owner.discriminator}** a accepté votre like.")
-        await owner_dm.send(f"✅ Vous avez accepté le like de **{liker.name}#{liker.discriminator}**.")
-        for child in self.children:
-            child.disabled = True
-        await interaction.message.edit(view=self)
-
-    @discord.ui.button(label="Refuser", style=discord.ButtonStyle.danger, custom_id="refuse")
-    async def refuse(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["owner_id"]), int(match["liker_id"]), match["action"])
+
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
         if interaction.user.id != self.owner_id:
             return await interaction.response.send_message("❌ Non autorisé.", ephemeral=True)
-        owner = await self.bot.fetch_user(self.owner_id)
-        liker = await self.bot.fetch_user(self.liker_id)
-        # Send refusal DM to liker
+        # Désactive les boutons en guise de réponse
+        await interaction.response.edit_message(view=like_reply_view(self.owner_id, self.liker_id, disabled=True))
+        owner = interaction.user
+        liker = bot.get_user(self.liker_id) or await bot.fetch_user(self.liker_id)
         liker_dm = await liker.create_dm()
-        await liker_dm.send(f"❌ La personne que vous avez aimé n'a pas retenu votre like.")
-        # Send confirmation DM to owner
-        owner_dm = await owner.create_dm()
-        await owner_dm.send(f"❌ Vous avez refusé le like de ** la personne qui vous a aimée**.")
-        # Disable buttons
-        for child in self.children:
-            child.disabled = True
-        await interaction.message.edit(view=self)
+        if self.action == "accept":
+            await liker_dm.send(f"✅ **{owner.name}#{owner.discriminator}** a accepté votre like.")
+            await interaction.followup.send(f"✅ Vous avez accepté le like de **{liker.name}#{liker.discriminator}**.")
+        else:
+            await liker_dm.send(f"❌ La personne que vous avez aimé n'a pas retenu votre like.")
+            await interaction.followup.send(f"❌ Vous avez refusé le like de ** la personne qui vous a aimée**.")
 
 
 class ProfileCog(commands.Cog):
@@ -328,8 +379,13 @@ class ProfileCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         bot.add_view(ProfileActionsView(bot))
+        bot.add_dynamic_items(LikeButton, LikeReplyButton)
         self.republish_profiles.start()
 
+    async def cog_unload(self):
+        self.republish_profiles.cancel()
+        self.bot.remove_dynamic_items(LikeButton, LikeReplyButton)
+
     @app_commands.command(name="profile_setup", description="Configure les salons pour le système de profils.")
     @app_commands.checks.has_permissions(administrator=True)
     async def profile_setup(self, interaction: discord.Interaction):
@@ -352,28 +408,57 @@ class ProfileCog(commands.Cog):
         else:
             raise error
 
-    @tasks.loop(hours=24)
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        # Nouvel avatar : la carte publiée n'est plus à jour sur tous les serveurs
+        if before.display_avatar != after.display_avatar:
+            await profile_collection.update_many({"user_id": after.id}, {"$set": {"dirty": True}})
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        # Avatar propre au serveur
+        if before.display_avatar != after.display_avatar:
+            await profile_collection.update_one(
+                {"guild_id": after.guild.id, "user_id": after.id}, {"$set": {"dirty": True}}
+            )
+
+    @tasks.loop(minutes=REPUBLISH_TICK_MINUTES)
     async def republish_profiles(self):
-        for guild in self.bot.guilds:
-            cfg = await profile_collection.find_one({"_id": f"config_{guild.id}"})
-            if not cfg:
+        """
+        Reposte les profils modifiés (`dirty`, posé par la modification ou un changement d'avatar),
+        jamais publiés ou dont la publication a plus de REPUBLISH_INTERVAL, les plus anciens d'abord
+        et au plus REPUBLISH_GUILD_BUDGET par serveur. Les candidats sont choisis par la requête :
+        le curseur est abandonné dès que le budget est atteint.
+        """
+        now = datetime.datetime.utcnow()
+        cutoff = now - REPUBLISH_INTERVAL
+        async for cfg in profile_collection.find({"_id": {"$regex": "^config_"}}):
+            guild = self.bot.get_guild(int(cfg["_id"].removeprefix("config_")))
+            if not guild:
                 continue
-            cursor = profile_collection.find({"guild_id": guild.id, "user_id": {"$ne": None}})
+            published, gone = 0, []
+            cursor = profile_collection.find({
+                "guild_id": guild.id,
+                "user_id": {"$ne": None},
+                "$or": [{"published_at": None}, {"published_at": {"$lt": cutoff}}, {"dirty": True}],
+            }).sort("published_at", 1).batch_size(REPUBLISH_GUILD_BUDGET)
             async for doc in cursor:
+                if published >= REPUBLISH_GUILD_BUDGET:
+                    break
                 member = guild.get_member(doc["user_id"])
-                if not member:
+                if member is None:
+                    # Membre parti : rien à publier, on repousse au prochain intervalle
+                    gone.append(doc["_id"])
                     continue
-                buf = await render_profile_to_image({"avatar_url": member.display_avatar.url, **doc})
-                ch = guild.get_channel(cfg.get(f"{doc['gender']}_channel"))
-                if not ch:
-                    continue
-                try:
-                    emo = discord.PartialEmoji.from_str(cfg.get("emoji", "💖"))
-                except:
-                    emo = cfg.get("emoji", "💖")
-                view = LikeView(self.bot, guild.id, doc["user_id"], emo)
-                msg = await ch.send(file=File(buf, "profile.png"), view=view)
-                self.bot.add_view(view, message_id=msg.id)
+                # Un échec est enregistré par publish_profile : il compte dans le budget et ne revient pas au tick suivant
+                await publish_profile(guild, cfg, doc, member)
+                published += 1
+            await cursor.close()
+            if gone:
+                await profile_collection.bulk_write(
+                    [UpdateOne({"_id": _id}, {"$set": {"published_at": now}, "$unset": {"dirty": ""}}) for _id in gone],
+                    ordered=False
+                )
 
     @republish_profiles.before_loop
     async def before_republish(self):
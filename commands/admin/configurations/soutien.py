@@ -13,6 +13,7 @@ from config.params import (
     EMOJIS,
 )
 from config.mongo import soutien_collection
+from config.cache import soutien_cache
 
 
 class PhraseModal(Modal, title="Définir la phrase de soutien"):
@@ -146,6 +147,7 @@ class SoutienView(View):
             }},
             upsert=True,
         )
+        soutien_cache.invalidate(interaction.guild_id)
 
         chan = interaction.guild.get_channel(self.announce_ch_id)  # type: ignore
         if chan:
@@ -8,6 +8,7 @@ from discord import app_commands, PartialEmoji
 from discord.ui import View, Button, Modal, TextInput
 
 from config.mongo import suggestions_collection
+from config.router import routed_view
 from config.params import EMBED_COLOR, EMBED_FOOTER_TEXT, EMBED_FOOTER_ICON_URL
 
 def _now_utc():
@@ -20,25 +21,30 @@ def parse_label(label: str):
         return None, PartialEmoji(name=m.group('name'), id=int(m.group('id')))
     return label, None
 
-class SuggestionButton(Button):
-    def __init__(self, guild_id: int, label: str):
-        lbl, emoji = parse_label(label)
-        super().__init__(label=lbl, emoji=emoji, style=discord.ButtonStyle.primary, custom_id=f"suggest_button:{guild_id}")
+class SuggestionButton(discord.ui.DynamicItem[Button], template=r"suggest_button:(?P<guild_id>\d+)"):
+    """Bouton « Soumettre » du panneau, routé par son custom_id : aucune vue à restaurer."""
+
+    def __init__(self, guild_id: int, label: str = None, emoji=None):
+        if label is not None:
+            label, emoji = parse_label(label)
+        super().__init__(Button(
+            label=label, emoji=emoji, style=discord.ButtonStyle.primary, custom_id=f"suggest_button:{guild_id}"
+        ))
         self.guild_id = guild_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(int(match["guild_id"]), emoji=item.emoji)
+
     async def callback(self, interaction: discord.Interaction):
         if interaction.guild_id != self.guild_id:
             await interaction.response.send_message("Mauvais serveur.", ephemeral=True)
             return
         await interaction.response.send_modal(SuggestionModal(self.guild_id))
 
-class SuggestionConfigView(View):
-    def __init__(self, bot: commands.Bot, guild_id: int, channel_id: int, button_label: str):
-        super().__init__(timeout=None)
-        self.bot = bot
-        self.guild_id = guild_id
-        self.channel_id = channel_id
-        self.add_item(SuggestionButton(guild_id, button_label))
+def panel_view(guild_id: int, button_label: str) -> View:
+    """Vue du panneau, arrêtée avant l'envoi : les clics passent par SuggestionButton."""
+    return routed_view(SuggestionButton(guild_id, button_label))
 
 class SuggestionModal(Modal, title="Votre suggestion"):
     def __init__(self, guild_id: int):
@@ -77,7 +83,7 @@ class SuggestionModal(Modal, title="Votre suggestion"):
             icon_url=EMBED_FOOTER_ICON_URL
         )
 
-        view = ApproveRejectView(self.guild_id, new_count)
+        view = decision_view(self.guild_id, new_count)
         channel = interaction.client.get_channel(config["channel_id"])
         suggestion_msg = await channel.send(embed=embed, view=view)
 
@@ -107,12 +113,7 @@ class SuggestionModal(Modal, title="Votre suggestion"):
         panel_embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
         panel_msg = await channel.send(
             embed=panel_embed,
-            view=SuggestionConfigView(
-                interaction.client,
-                self.guild_id,
-                config["channel_id"],
-                config["button_label"]
-            )
+            view=panel_view(self.guild_id, config["button_label"])
         )
         await suggestions_collection.update_one(
             {"kind": "config", "guild_id": self.guild_id},
@@ -121,101 +122,85 @@ class SuggestionModal(Modal, title="Votre suggestion"):
 
         await interaction.response.send_message("✅ Votre suggestion a été envoyée !", ephemeral=True)
 
-class ApproveButton(Button):
-    def __init__(self, guild_id: int, suggestion_id: int):
-        super().__init__(label="Approuver", style=discord.ButtonStyle.success,
-                         custom_id=f"approve_button:{guild_id}:{suggestion_id}")
+class SuggestionDecisionButton(
+    discord.ui.DynamicItem[Button],
+    # suggest:<guild>:<id>:approve|reject, et les anciens approve_button:/reject_button:<guild>:<id>
+    # (re n'accepte pas deux groupes du même nom : ceux de l'ancien format sont préfixés legacy_)
+    template=(
+        r"suggest:(?P<guild_id>\d+):(?P<suggestion_id>\d+):(?P<action>approve|reject)"
+        r"|(?P<legacy_action>approve|reject)_button:(?P<legacy_guild_id>\d+):(?P<legacy_suggestion_id>\d+)"
+    )
+):
+    """Approuver / Rejeter de toutes les suggestions : un seul routeur, mémoire constante."""
+
+    def __init__(self, guild_id: int, suggestion_id: int, action: str):
+        approve = action == "approve"
+        super().__init__(Button(
+            label="Approuver" if approve else "Rejeter",
+            style=discord.ButtonStyle.success if approve else discord.ButtonStyle.danger,
+            custom_id=f"suggest:{guild_id}:{suggestion_id}:{action}"
+        ))
         self.guild_id = guild_id
         self.suggestion_id = suggestion_id
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        if match["action"]:
+            return cls(int(match["guild_id"]), int(match["suggestion_id"]), match["action"])
+        return cls(int(match["legacy_guild_id"]), int(match["legacy_suggestion_id"]), match["legacy_action"])
 
     async def callback(self, interaction: discord.Interaction):
         if not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message("Permission refusée.", ephemeral=True)
             return
 
-        msg = interaction.message
-        embed = msg.embeds[0]
-        decision_time = _now_utc().strftime('%Y-%m-%d %H:%M UTC')
-        embed.color = discord.Color.green()
-        embed.add_field(
-            name="Statut",
-            value=f"Approuvé par {interaction.user.display_name} le {decision_time}",
-            inline=False
-        )
-
-        await suggestions_collection.delete_one({
+        # Une suggestion en attente n'existe qu'une fois : le premier clic la retire
+        sugg = await suggestions_collection.find_one_and_delete({
             "kind": "suggestion",
             "guild_id": self.guild_id,
             "suggestion_id": self.suggestion_id
         })
-
-        await msg.edit(embed=embed, view=None)
-        await interaction.response.send_message("Suggestion approuvée.", ephemeral=True)
-
-class RejectButton(Button):
-    def __init__(self, guild_id: int, suggestion_id: int):
-        super().__init__(label="Rejeter", style=discord.ButtonStyle.danger,
-                         custom_id=f"reject_button:{guild_id}:{suggestion_id}")
-        self.guild_id = guild_id
-        self.suggestion_id = suggestion_id
-
-    async def callback(self, interaction: discord.Interaction):
-        if not interaction.user.guild_permissions.administrator:
-            await interaction.response.send_message("Permission refusée.", ephemeral=True)
+        msg = interaction.message
+        if sugg is None:
+            await msg.edit(view=None)
+            await interaction.response.send_message("Cette suggestion a déjà été traitée.", ephemeral=True)
             return
 
-        msg = interaction.message
+        approve = self.action == "approve"
         embed = msg.embeds[0]
         decision_time = _now_utc().strftime('%Y-%m-%d %H:%M UTC')
-        embed.color = discord.Color.red()
+        embed.color = discord.Color.green() if approve else discord.Color.red()
         embed.add_field(
             name="Statut",
-            value=f"Rejeté par {interaction.user.display_name} le {decision_time}",
+            value=f"{'Approuvé' if approve else 'Rejeté'} par {interaction.user.display_name} le {decision_time}",
             inline=False
         )
 
-        await suggestions_collection.delete_one({
-            "kind": "suggestion",
-            "guild_id": self.guild_id,
-            "suggestion_id": self.suggestion_id
-        })
-
         await msg.edit(embed=embed, view=None)
-        await interaction.response.send_message("Suggestion rejetée.", ephemeral=True)
+        await interaction.response.send_message(
+            "Suggestion approuvée." if approve else "Suggestion rejetée.", ephemeral=True
+        )
 
-class ApproveRejectView(View):
-    def __init__(self, guild_id: int, suggestion_id: int):
-        super().__init__(timeout=None)
-        self.add_item(ApproveButton(guild_id, suggestion_id))
-        self.add_item(RejectButton(guild_id, suggestion_id))
+def decision_view(guild_id: int, suggestion_id: int) -> View:
+    """Vue jointe à une suggestion, arrêtée avant l'envoi (rien n'est gardé par message)."""
+    return routed_view(
+        SuggestionDecisionButton(guild_id, suggestion_id, "approve"),
+        SuggestionDecisionButton(guild_id, suggestion_id, "reject"),
+    )
 
 class SuggestionCog(commands.Cog):
     """Cog pour gérer le système de suggestions"""
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        # Recharge les vues persistantes au démarrage
-        async for config in suggestions_collection.find({"kind": "config"}):
-            view = SuggestionConfigView(self.bot,
-                                        config["guild_id"],
-                                        config["channel_id"],
-                                        config["button_label"])
-            try:
-                chan = self.bot.get_channel(config["channel_id"])
-                msg = await chan.fetch_message(int(config["message_id"]))
-                self.bot.add_view(view, message_id=msg.id)
-            except:
-                pass
-        async for sugg in suggestions_collection.find({"kind": "suggestion"}):
-            view = ApproveRejectView(sugg["guild_id"], sugg["suggestion_id"])
-            try:
-                chan = self.bot.get_channel(sugg["channel_id"])
-                msg = await chan.fetch_message(int(sugg["message_id"]))
-                self.bot.add_view(view, message_id=msg.id)
-            except:
-                pass
+    async def cog_load(self):
+        # Enregistré une seule fois pendant setup_hook : les boutons des panneaux et des
+        # suggestions en attente sont reconnus à leur custom_id, sans fetch ni lecture Mongo.
+        self.bot.add_dynamic_items(SuggestionButton, SuggestionDecisionButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(SuggestionButton, SuggestionDecisionButton)
 
     @app_commands.command(name="set_suggestion")
     @app_commands.describe(
@@ -259,7 +244,7 @@ class SuggestionCog(commands.Cog):
         )
         panel_embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
         panel_msg = await channel.send(embed=panel_embed,
-                                       view=SuggestionConfigView(self.bot, interaction.guild_id, channel.id, button_label))
+                                       view=panel_view(interaction.guild_id, button_label))
         await suggestions_collection.update_one(
             {"kind": "config", "guild_id": interaction.guild_id},
             {"$set": {"message_id": str(panel_msg.id)}}
@@ -1,19 +1,334 @@
 # commands/admin/roles/mass_role.py
-# commande complété 
+# commande complété
 import discord
 from discord import app_commands
 from discord.ext import commands
 import asyncio
+import logging
+import os
 import time
 import datetime
 
+from bson import ObjectId
+
 from config.params import EMBED_COLOR, EMBED_FOOTER_TEXT, EMBED_FOOTER_ICON_URL
+from config.mongo import massrole_jobs_collection
+
+log = logging.getLogger("elda.massrole")
+
+# Éditions de rôles en parallèle : discord.py sérialise déjà les requêtes d'un même bucket
+# et rejoue les 429, les workers servent à ne jamais laisser le bucket inactif.
+MASSROLE_WORKERS  = int(os.getenv("MASSROLE_WORKERS", 4))
+PROGRESS_INTERVAL = 5.0   # secondes entre deux mises à jour de l'embed et de Mongo
+
+
+def _footer(embed: discord.Embed) -> discord.Embed:
+    embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
+    return embed
+
+
+class RoleJob:
+    """
+    Opération de masse sur un rôle, persistée dans `massrole_jobs`.
+    Le diff est fait sur le cache membres : seuls les membres à modifier sont traités,
+    ce qui rend aussi la reprise après redémarrage naturelle (on rediffe simplement).
+    """
+
+    def __init__(self, bot: commands.Bot, doc: dict):
+        self.bot = bot
+        self.id: ObjectId = doc["_id"]
+        self.guild = bot.get_guild(doc["guild_id"])
+        self.role = self.guild.get_role(doc["role_id"]) if self.guild else None
+        self.add: bool = doc["add"]
+        self.channel_id = doc.get("channel_id")
+        self.message_id = doc.get("message_id")
+        self.processed: int = doc.get("processed", 0)
+        self.failed: int = doc.get("failed", 0)
+        # Membres en échec, déjà comptés dans processed/failed : exclus du rediff à la reprise
+        self.failed_ids: set[int] = set(doc.get("failed_ids", ()))
+        self._unsaved_failed: list[int] = []
+        self.status: str = doc.get("status", "running")
+        self.total = self.processed
+        self.view: "JobControlView | None" = None
+
+        self._resume = asyncio.Event()
+        if self.status != "paused":
+            self._resume.set()
+        self._cancelled = False
+        self._run_done = 0           # traités depuis le (re)démarrage, pour l'ETA
+        self._run_elapsed = 0.0      # temps actif (hors pause) depuis le (re)démarrage
+        self._active_since: float | None = None
+
+    # ---------- Contrôle ----------
+    def pause(self):
+        if self.status == "running":
+            self.status = "paused"
+            self._resume.clear()
+            self._stop_clock()
+
+    def resume(self):
+        if self.status == "paused":
+            self.status = "running"
+            self._resume.set()
+            self._start_clock()
+
+    def cancel(self):
+        self._cancelled = True
+        self.status = "cancelled"
+        self._resume.set()   # débloque les workers en pause pour qu'ils sortent
+
+    def _start_clock(self):
+        self._active_since = time.monotonic()
+
+    def _stop_clock(self):
+        if self._active_since is not None:
+            self._run_elapsed += time.monotonic() - self._active_since
+            self._active_since = None
+
+    # ---------- Exécution ----------
+    def _targets(self) -> list[discord.Member]:
+        if self.add:
+            members = [m for m in self.guild.members if m.get_role(self.role.id) is None]
+        else:
+            members = self.role.members
+        return [m for m in members if m.id not in self.failed_ids]
+
+    async def run(self):
+        pending = self._targets()
+        self.total = self.processed + len(pending)
+        queue: asyncio.Queue = asyncio.Queue()
+        for member in pending:
+            queue.put_nowait(member)
+
+        if self.status == "running":
+            self._start_clock()
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(MASSROLE_WORKERS)]
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            for w in workers:
+                w.cancel()
+
+        self._stop_clock()
+        if not self._cancelled:
+            self.status = "done"
+        await self._save()
+        await self._update_message()
+        if self.view:
+            self.view.stop()   # retire la vue du ViewStore
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            await self._resume.wait()
+            if self._cancelled:
+                return
+            try:
+                member = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                if self.add:
+                    await member.add_roles(self.role, reason="MassRole operation")
+                else:
+                    await member.remove_roles(self.role, reason="MassRole operation")
+            except discord.NotFound:
+                pass   # membre parti entre-temps
+            except discord.HTTPException as e:
+                self.failed += 1
+                self.failed_ids.add(member.id)
+                self._unsaved_failed.append(member.id)
+                log.warning("MassRole %s : échec sur %s (%s)", self.id, member.id, e)
+            self.processed += 1
+            self._run_done += 1
+
+    async def _report_loop(self):
+        last = None
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            snapshot = (self.processed, self.failed, self.status)
+            if snapshot == last:
+                continue   # en pause : rien à réécrire
+            last = snapshot
+            await self._save()
+            await self._update_message()
+
+    async def _save(self):
+        update = {"$set": {
+            "processed": self.processed,
+            "failed": self.failed,
+            "status": self.status,
+            "updated_at": datetime.datetime.utcnow(),
+        }}
+        new_failed = list(self._unsaved_failed)
+        if new_failed:
+            update["$addToSet"] = {"failed_ids": {"$each": new_failed}}
+        await massrole_jobs_collection.update_one({"_id": self.id}, update)
+        del self._unsaved_failed[:len(new_failed)]
+
+    # ---------- Affichage ----------
+    def _eta(self) -> str:
+        elapsed = self._run_elapsed
+        if self._active_since is not None:
+            elapsed += time.monotonic() - self._active_since
+        if not self._run_done:
+            return "Calcul en cours…"
+        remaining = self.total - self.processed
+        return str(datetime.timedelta(seconds=int(remaining * elapsed / self._run_done)))
+
+    def build_embed(self) -> discord.Embed:
+        action = "Ajout" if self.add else "Retrait"
+        role_mention = f"<@&{self.role.id}>" if self.role else "rôle supprimé"
+        if self.status == "done":
+            embed = discord.Embed(
+                title="Opération terminée ✅",
+                description=(
+                    f"{action} du rôle {role_mention} terminé pour **{self.processed}** membres."
+                    + (f"\n⚠️ {self.failed} échec(s)." if self.failed else "")
+                ),
+                color=EMBED_COLOR
+            )
+            return _footer(embed)
+        if self.status == "cancelled":
+            embed = discord.Embed(
+                title="Opération annulée ⛔",
+                description=f"{action} du rôle {role_mention} arrêté après **{self.processed}/{self.total}** membres.",
+                color=EMBED_COLOR
+            )
+            return _footer(embed)
+
+        title = f"{action} de rôle en pause ⏸️" if self.status == "paused" else f"{action} de rôle en cours…"
+        embed = discord.Embed(title=title, color=EMBED_COLOR)
+        embed.add_field(name="Rôle", value=role_mention, inline=True)
+        embed.add_field(name="Progression", value=f"{self.processed}/{self.total}", inline=True)
+        embed.add_field(name="Restant", value=str(self.total - self.processed), inline=True)
+        embed.add_field(name="ETA", value="—" if self.status == "paused" else self._eta(), inline=True)
+        if self.failed:
+            embed.add_field(name="Échecs", value=str(self.failed), inline=True)
+        return _footer(embed)
+
+    async def _update_message(self):
+        if not self.message_id or not self.guild:
+            return
+        channel = self.guild.get_channel_or_thread(self.channel_id)
+        if channel is None:
+            return
+        finished = self.status in ("done", "cancelled")
+        if self.view and not finished:
+            self.view.refresh(self.status)
+        try:
+            await channel.get_partial_message(self.message_id).edit(
+                embed=self.build_embed(),
+                view=None if finished else self.view
+            )
+        except discord.NotFound:
+            self.message_id = None
+        except discord.HTTPException:
+            pass
+
+
+class JobControlView(discord.ui.View):
+    """Boutons Pause / Reprendre / Annuler du message de progression."""
+
+    def __init__(self, cog: "MassRole", job_id: ObjectId, status: str = "running"):
+        super().__init__(timeout=None)
+        self.cog = cog
+        self.job_id = job_id
+
+        self.toggle = discord.ui.Button(
+            style=discord.ButtonStyle.secondary, custom_id=f"massrole:{job_id}:toggle"
+        )
+        self.toggle.callback = self._toggle
+        self.cancel = discord.ui.Button(
+            label="Annuler", emoji="⛔", style=discord.ButtonStyle.danger,
+            custom_id=f"massrole:{job_id}:cancel"
+        )
+        self.cancel.callback = self._cancel
+        self.refresh(status)
+        self.add_item(self.toggle)
+        self.add_item(self.cancel)
+
+    def refresh(self, status: str):
+        paused = status == "paused"
+        self.toggle.label = "Reprendre" if paused else "Pause"
+        self.toggle.emoji = "▶️" if paused else "⏸️"
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.guild_permissions.administrator:
+            return True
+        await interaction.response.send_message(
+            "❌ Seul un administrateur peut contrôler cette opération.", ephemeral=True
+        )
+        return False
+
+    async def _toggle(self, interaction: discord.Interaction):
+        job = self.cog.jobs.get(self.job_id)
+        if job is None:
+            return await interaction.response.send_message("❌ Opération introuvable ou terminée.", ephemeral=True)
+        if job.status == "paused":
+            job.resume()
+        else:
+            job.pause()
+        self.refresh(job.status)
+        await interaction.response.edit_message(embed=job.build_embed(), view=self)
+        await job._save()
+
+    async def _cancel(self, interaction: discord.Interaction):
+        job = self.cog.jobs.get(self.job_id)
+        if job is None:
+            return await interaction.response.send_message("❌ Opération introuvable ou terminée.", ephemeral=True)
+        job.cancel()
+        await interaction.response.edit_message(embed=job.build_embed(), view=None)
+
 
 class MassRole(commands.Cog):
     """Cog pour ajouter ou retirer massivement un rôle à tous les membres."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.jobs: dict[ObjectId, RoleJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def cog_load(self):
+        # Reprise des opérations interrompues par un redémarrage
+        self.bot.loop.create_task(self._resume_jobs())
+
+    async def cog_unload(self):
+        # Les opérations restent "running" en base : elles reprendront au prochain démarrage
+        for job in self.jobs.values():
+            if job.view:
+                job.view.stop()
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _resume_jobs(self):
+        await self.bot.wait_until_ready()
+        async for doc in massrole_jobs_collection.find({"status": {"$in": ["running", "paused"]}}):
+            job = RoleJob(self.bot, doc)
+            if job.guild is None or job.role is None:
+                job.status = "cancelled"
+                await job._save()
+                continue
+            if not job.guild.chunked:
+                await job.guild.chunk()
+            log.info("Reprise de l'opération MassRole %s (%d déjà traités)", job.id, job.processed)
+            job.view = JobControlView(self, job.id, job.status)
+            if job.message_id:
+                self.bot.add_view(job.view, message_id=job.message_id)
+            self._launch(job)
+
+    def _launch(self, job: RoleJob):
+        self.jobs[job.id] = job
+        task = self.bot.loop.create_task(job.run())
+        self._tasks.add(task)
+
+        def _done(t: asyncio.Task):
+            self._tasks.discard(t)
+            self.jobs.pop(job.id, None)
+            if not t.cancelled() and t.exception():
+                log.error("MassRole %s interrompu", job.id, exc_info=t.exception())
+        task.add_done_callback(_done)
 
     # Groupe de slash-commands /massrole
     massrole = app_commands.Group(
@@ -55,74 +370,65 @@ class MassRole(commands.Cog):
                 description="❌ Vous devez être administrateur pour utiliser cette commande.",
                 color=EMBED_COLOR
             )
-            embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-            return await interaction.response.send_message(embed=embed, ephemeral=True)
+            return await interaction.response.send_message(embed=_footer(embed), ephemeral=True)
 
-        await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        start_time = time.monotonic()
+        # Une seule opération à la fois par serveur : elles se partagent le même bucket Discord
+        if any(job.guild.id == guild.id for job in self.jobs.values()):
+            embed = discord.Embed(
+                description="❌ Une opération MassRole est déjà en cours sur ce serveur.",
+                color=EMBED_COLOR
+            )
+            return await interaction.response.send_message(embed=_footer(embed), ephemeral=True)
 
-        # Récupère tous les membres (Intent Members requis)
-        members = [m async for m in guild.fetch_members(limit=None)]
-        total = len(members)
-        processed = 0
+        await interaction.response.defer(ephemeral=True)
 
-        # Embed initial
-        embed = discord.Embed(
-            title=f"{'Ajout' if add else 'Retrait'} de rôle en cours…",
-            color=EMBED_COLOR
-        )
-        embed.add_field(name="Rôle", value=f"<@&{role.id}>", inline=True)
-        embed.add_field(name="Progression", value=f"{processed}/{total}", inline=True)
-        embed.add_field(name="Restant", value=str(total), inline=True)
-        embed.add_field(name="ETA", value="Calcul en cours…", inline=True)
-        embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
+        # Le cache membres est rempli au démarrage (Intent Members) : pas de fetch_members
+        if not guild.chunked:
+            await guild.chunk()
+
+        doc = {
+            "_id": ObjectId(),
+            "guild_id": guild.id,
+            "role_id": role.id,
+            "add": add,
+            "channel_id": interaction.channel_id,
+            "message_id": None,
+            "processed": 0,
+            "failed": 0,
+            "status": "running",
+            "author_id": interaction.user.id,
+            "created_at": datetime.datetime.utcnow(),
+        }
+        job = RoleJob(self.bot, doc)
+        job.total = len(job._targets())
+        if job.total == 0:
+            embed = discord.Embed(
+                description=f"✅ Aucun membre à modifier : tout le monde {'a déjà' if add else 'est déjà sans'} le rôle <@&{role.id}>.",
+                color=EMBED_COLOR
+            )
+            return await interaction.followup.send(embed=_footer(embed), ephemeral=True)
 
-        progress_message = await interaction.followup.send(embed=embed)
+        # Message de progression dans le salon (le token du followup expire au bout de 15 min)
+        job.view = JobControlView(self, job.id)
+        try:
+            progress_message = await interaction.channel.send(embed=job.build_embed(), view=job.view)
+        except discord.HTTPException:
+            embed = discord.Embed(
+                description="❌ Impossible d'envoyer le message de progression dans ce salon.",
+                color=EMBED_COLOR
+            )
+            return await interaction.followup.send(embed=_footer(embed), ephemeral=True)
+
+        doc["message_id"] = job.message_id = progress_message.id
+        await massrole_jobs_collection.insert_one(doc)
+        self._launch(job)
 
-        # Boucle d’assignation/retrait
-        for member in members:
-            try:
-                if add:
-                    await member.add_roles(role, reason="MassRole operation")
-                else:
-                    await member.remove_roles(role, reason="MassRole operation")
-            except Exception:
-                # Vous pouvez logger l’erreur ici si besoin
-                pass
-
-            processed += 1
-
-            # Mise à jour toutes les 20 itérations ou à la fin
-            if processed % 20 == 0 or processed == total:
-                elapsed = time.monotonic() - start_time
-                avg = elapsed / processed
-                remaining = total - processed
-                eta = datetime.timedelta(seconds=int(remaining * avg))
-
-                embed = discord.Embed(
-                    title=f"{'Ajout' if add else 'Retrait'} de rôle en cours…",
-                    color=EMBED_COLOR
-                )
-                embed.add_field(name="Rôle", value=f"<@&{role.id}>", inline=True)
-                embed.add_field(name="Progression", value=f"{processed}/{total}", inline=True)
-                embed.add_field(name="Restant", value=str(remaining), inline=True)
-                embed.add_field(name="ETA", value=str(eta), inline=True)
-                embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-
-                await progress_message.edit(embed=embed)
-
-        # Embed de fin
         embed = discord.Embed(
-            title="Opération terminée ✅",
-            description=(
-                f"{'Ajout' if add else 'Retrait'} du rôle "
-                f"<@&{role.id}> terminé pour **{total}** membres."
-            ),
+            description=f"🚀 Opération lancée sur **{job.total}** membres : {progress_message.jump_url}",
             color=EMBED_COLOR
         )
-        embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-        await progress_message.edit(embed=embed)
+        await interaction.followup.send(embed=_footer(embed), ephemeral=True)
 
     @commands.Cog.listener()
     async def on_app_command_error(
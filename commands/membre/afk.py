@@ -49,6 +49,12 @@ class AFKListView(View):
 class AFK(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # Index local (guild_id, user_id) -> document AFK : on_message ne touche plus Mongo
+        self.afk_index: dict[tuple[int, int], dict] = {}
+
+    async def cog_load(self):
+        async for doc in afk_collection.find({}):
+            self.afk_index[(doc["guild_id"], doc["user_id"])] = doc
 
     afk = app_commands.Group(name="afk", description="Commandes AFK")
 
@@ -59,8 +65,7 @@ class AFK(commands.Cog):
         user = interaction.user
 
         # 1) Vérifier si déjà AFK
-        existing = await afk_collection.find_one({"guild_id": guild.id, "user_id": user.id})
-        if existing:
+        if (guild.id, user.id) in self.afk_index:
             embed = Embed(
                 title=MESSAGES.get('afk_error_title', 'Erreur AFK'),
                 description=MESSAGES.get('afk_already_set', 'Vous êtes déjà en mode AFK.'),
@@ -82,14 +87,15 @@ class AFK(commands.Cog):
         # 3) Enregistrer en base
         original_nick = user.display_name
         now = datetime.utcnow()
+        record = {
+            "reason": reason,
+            "original_nickname": original_nick,
+            "start_time": now
+        }
         try:
             await afk_collection.update_one(
                 {"guild_id": guild.id, "user_id": user.id},
-                {"$set": {
-                    "reason": reason,
-                    "original_nickname": original_nick,
-                    "start_time": now
-                }},
+                {"$set": record},
                 upsert=True
             )
         except Exception:
@@ -100,6 +106,7 @@ class AFK(commands.Cog):
             )
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
+        self.afk_index[(guild.id, user.id)] = {"guild_id": guild.id, "user_id": user.id, **record}
 
         # 4) Changer le pseudo si permission
         me = guild.me or guild.get_member(self.bot.user.id)
@@ -162,8 +169,8 @@ class AFK(commands.Cog):
         guild = message.guild
         author = message.author
 
-        # Retour d'AFK
-        doc = await afk_collection.find_one({"guild_id": guild.id, "user_id": author.id})
+        # Retour d'AFK (lookup mémoire, la base n'est touchée que si l'auteur était AFK)
+        doc = self.afk_index.pop((guild.id, author.id), None)
         if doc:
             await afk_collection.delete_one({"guild_id": guild.id, "user_id": author.id})
             try:
@@ -193,7 +200,7 @@ class AFK(commands.Cog):
 
         # Mention d'AFK
         for user in message.mentions:
-            doc = await afk_collection.find_one({"guild_id": guild.id, "user_id": user.id})
+            doc = self.afk_index.get((guild.id, user.id))
             if doc:
                 try:
                     await message.delete()
@@ -1,28 +1,112 @@
 # commands/membre/memberstats.py
 
+import asyncio
 import datetime
+import logging
+import os
+import time
 from io import BytesIO
 
 import discord
 from discord import File, app_commands
-from discord.ext import commands
-import jinja2
-from playwright.async_api import async_playwright
+from discord.ext import commands, tasks
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from config.mongo import stats_collection
+from config.render import render_pool
+
+log = logging.getLogger("elda.stats")
+
+STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", 10))   # flush périodique
+STATS_FLUSH_MAX     = int(os.getenv("STATS_FLUSH_MAX", 500))        # flush anticipé au-delà de N clés
+STATS_RETRY_SECONDS = float(os.getenv("STATS_RETRY_SECONDS", 30))   # délai minimal entre deux essais après un échec
 
 def getChannelName(guild: discord.Guild, channel_id: int) -> str:
     chan = guild.get_channel(channel_id)
     return chan.name if chan else f"#{channel_id}"
 
-# --- Setup Jinja2 ---
-template_env = jinja2.Environment(
-    loader=jinja2.FileSystemLoader("templates"),
-    autoescape=jinja2.select_autoescape(["html"]),
-    trim_blocks=True,
-    lstrip_blocks=True
-)
-template = template_env.get_template("user_stats.html")
+
+class StatsBuffer:
+    """
+    Tampon d'écriture différée : fusionne les `$inc` par document cible
+    (guild, user, jour) / (guild, user, salon) et les écrit en un seul bulk_write non ordonné.
+    """
+
+    def __init__(self, collection, max_entries: int = STATS_FLUSH_MAX) -> None:
+        self.collection = collection
+        self.max_entries = max_entries
+        self._pending: dict[tuple, dict[str, int]] = {}
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        # Après un échec (Mongo indisponible), pas de nouvel essai avant _retry_after (time.monotonic)
+        self._retry_after = 0.0
+        self._failures = 0
+        # Métriques
+        self.max_depth = 0
+        self.flushes = 0
+        self.ops_written = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Nombre de documents en attente d'écriture."""
+        return len(self._pending)
+
+    def add(self, query: dict, field: str, amount: int) -> None:
+        key = tuple(query.items())
+        deltas = self._pending.setdefault(key, {})
+        deltas[field] = deltas.get(field, 0) + amount
+        self.max_depth = max(self.max_depth, len(self._pending))
+        if (
+            len(self._pending) >= self.max_entries
+            and not (self._flush_task and not self._flush_task.done())
+            and time.monotonic() >= self._retry_after
+        ):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def _requeue(self, batch: dict[tuple, dict[str, int]]) -> None:
+        for key, deltas in batch.items():
+            pending = self._pending.setdefault(key, {})
+            for field, amount in deltas.items():
+                pending[field] = pending.get(field, 0) + amount
+
+    async def flush(self, force: bool = False) -> None:
+        """Écrit le tampon ; hors `force` (arrêt du cog), ne fait rien pendant le délai qui suit un échec."""
+        async with self._lock:
+            if not self._pending or (not force and time.monotonic() < self._retry_after):
+                return
+            batch, self._pending = self._pending, {}
+            keys = list(batch)
+            ops = [UpdateOne(dict(key), {"$inc": batch[key]}, upsert=True) for key in keys]
+            start = time.perf_counter()
+            try:
+                await self.collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # Non ordonné : seules les opérations en erreur sont remises en file
+                failed = {keys[err["index"]]: batch[keys[err["index"]]] for err in e.details.get("writeErrors", [])}
+                self._requeue(failed)
+                log.warning("Flush stats partiel : %d/%d opérations en échec", len(failed), len(ops))
+            except Exception:
+                self._requeue(batch)
+                self._failures += 1
+                self._retry_after = time.monotonic() + STATS_RETRY_SECONDS
+                # Trace complète une seule fois par panne, les essais suivants sont résumés
+                if self._failures == 1:
+                    log.exception("Flush stats impossible, %d documents remis en file", len(batch))
+                else:
+                    log.debug("Flush stats toujours impossible (essai %d), %d documents en file",
+                              self._failures, len(self._pending))
+                return
+            if self._failures:
+                log.info("Flush stats rétabli après %d échecs", self._failures)
+                self._failures = 0
+                self._retry_after = 0.0
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.ops_written += len(ops)
+            log.debug("Flush stats : %d opérations en %.1f ms (profondeur max %d)",
+                      len(ops), self.last_flush_ms, self.max_depth)
 
 
 class MemberStats(commands.Cog):
@@ -30,19 +114,30 @@ class MemberStats(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
         self.voice_sessions: dict[int, datetime.datetime] = {}
+        self.buffer = StatsBuffer(stats_collection)
+        self.flush_stats.start()
+
+    async def cog_unload(self) -> None:
+        # Flush final : rien ne doit être perdu à l'arrêt ou au rechargement
+        self.flush_stats.stop()
+        await self.buffer.flush(force=True)
+
+    @tasks.loop(seconds=STATS_FLUSH_SECONDS)
+    async def flush_stats(self) -> None:
+        await self.buffer.flush()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
         if message.author.bot or not message.guild:
             return
         today_str = datetime.date.today().isoformat()
-        await stats_collection.update_one(
+        self.buffer.add(
             {"guild_id": message.guild.id, "user_id": message.author.id, "type": "daily", "date": today_str},
-            {"$inc": {"msg_count": 1}}, upsert=True
+            "msg_count", 1
         )
-        await stats_collection.update_one(
+        self.buffer.add(
             {"guild_id": message.guild.id, "user_id": message.author.id, "type": "channel", "channel_id": message.channel.id},
-            {"$inc": {"msg_count": 1}}, upsert=True
+            "msg_count", 1
         )
 
     @commands.Cog.listener()
@@ -57,13 +152,13 @@ class MemberStats(commands.Cog):
             if start:
                 secs = int((now_dt - start).total_seconds())
                 day_str = start.date().isoformat()
-                await stats_collection.update_one(
+                self.buffer.add(
                     {"guild_id": member.guild.id, "user_id": member.id, "type": "daily", "date": day_str},
-                    {"$inc": {"voice_seconds": secs}}, upsert=True
+                    "voice_seconds", secs
                 )
-                await stats_collection.update_one(
+                self.buffer.add(
                     {"guild_id": member.guild.id, "user_id": member.id, "type": "channel", "channel_id": before.channel.id},
-                    {"$inc": {"voice_seconds": secs}}, upsert=True
+                    "voice_seconds", secs
                 )
 
     @app_commands.command(name="member-stats", description="Affiche les statistiques d'un membre.")
@@ -75,59 +170,64 @@ class MemberStats(commands.Cog):
         if not guild:
             return await interaction.followup.send("Cette commande doit être utilisée dans un serveur.", ephemeral=True)
 
-        # 1️⃣ Récupération des données
+        # 1️⃣ Récupération des données (on vide d'abord le tampon pour des chiffres à jour)
+        await self.buffer.flush()
         today = datetime.date.today()
         start_30 = today - datetime.timedelta(days=29)
-        docs = await stats_collection.find({"guild_id": guild.id, "user_id": member.id}).to_list(length=None)
-
-        # 2️⃣ Séries quotidiennes
-        daily_docs = [d for d in docs if d.get("type") == "daily" and d.get("date") >= start_30.isoformat()]
-        dates = [start_30 + datetime.timedelta(days=i) for i in range(30)]
-        msg_map = {d["date"]: d.get("msg_count", 0) for d in daily_docs}
-        voice_map = {d["date"]: d.get("voice_seconds", 0) // 60 for d in daily_docs}
-
-        msg_counts = [msg_map.get(d.isoformat(), 0) for d in dates]
-        voice_mins = [voice_map.get(d.isoformat(), 0) for d in dates]
-
-        total_msgs = sum(msg_counts)
-        total_voice = sum(voice_mins)
+        # Seules les lignes quotidiennes des 30 derniers jours, triées (index guild_id/user_id/type/date)
+        cursor = stats_collection.find(
+            {
+                "guild_id": guild.id,
+                "user_id": member.id,
+                "type": "daily",
+                "date": {"$gte": start_30.isoformat(), "$lte": today.isoformat()},
+            },
+            {"_id": 0, "date": 1, "msg_count": 1, "voice_seconds": 1},
+        ).sort("date", -1)
+        docs = await cursor.to_list(length=30)
+
+        # 2️⃣ Fenêtres 24h / 7j / 14j / 30j en une passe (7j et 14j couvrent n+1 jours, comme avant)
+        windows = (0, 7, 14, 29)
+        msgs = dict.fromkeys(windows, 0)
+        voice = dict.fromkeys(windows, 0)
+        for d in docs:
+            age = (today - datetime.date.fromisoformat(d["date"])).days
+            m, v = d.get("msg_count", 0), d.get("voice_seconds", 0) // 60
+            for w in windows:
+                if age <= w:
+                    msgs[w] += m
+                    voice[w] += v
+
+        total_msgs, total_voice = msgs[29], voice[29]
 
         # 3️⃣ Activité récente
-        def sum_last(n, data_map):
-            return sum(data_map.get((today - datetime.timedelta(days=i)).isoformat(), 0) for i in range(n+1))
-
-        m0 = msg_map.get(today.isoformat(), 0)           # messages 24h
-        m7 = sum_last(7, msg_map)                        # messages 7j
-        m14 = sum_last(14, msg_map)                      # messages 14j
-
-        v0 = voice_map.get(today.isoformat(), 0)         # voix 24h
-        v7 = sum_last(7, voice_map)                      # voix 7j
-        v14 = sum_last(14, voice_map)                    # voix 14j
-
-        # 4️⃣ Render le HTML
-        html = template.render(
-            avatar_url     = member.display_avatar.url,
-            username       = member.display_name,
-            server_name    = guild.name,
-            joined_date    = member.joined_at.strftime("%d %b %Y"),
-            total_messages = total_msgs,
-            total_voice    = total_voice,
-            m0 = m0, m7 = m7, m14 = m14,
-            v0 = v0, v7 = v7, v14 = v14,
-            generated_on   = datetime.datetime.utcnow().strftime("%d %B %Y à %H:%M")
-        )
-
-        # 5️⃣ Capture headless Chrome avec Playwright
-        async with async_playwright() as pw:
-            browser = await pw.chromium.launch(args=["--no-sandbox"])
-            # viewport ajusté en hauteur pour ne rien couper
-            page = await browser.new_page(viewport={"width": 700, "height": 600})
-            await page.set_content(html, wait_until="networkidle")
-            card = await page.query_selector(".card")
-            png = await card.screenshot(omit_background=True)
-            await browser.close()
-
-        # 6️⃣ Envoi du PNG
+        m0, m7, m14 = msgs[0], msgs[7], msgs[14]         # messages 24h / 7j / 14j
+        v0, v7, v14 = voice[0], voice[7], voice[14]      # voix 24h / 7j / 14j
+
+        # 4️⃣ Rendu HTML → PNG via le pool Chromium partagé (capture de la .card seule)
+        try:
+            png = await render_pool.render(
+                "user_stats.html",
+                {
+                    "avatar_url":     member.display_avatar.url,
+                    "username":       member.display_name,
+                    "server_name":    guild.name,
+                    "joined_date":    member.joined_at.strftime("%d %b %Y"),
+                    "total_messages": total_msgs,
+                    "total_voice":    total_voice,
+                    "m0": m0, "m7": m7, "m14": m14,
+                    "v0": v0, "v7": v7, "v14": v14,
+                    "generated_on":   datetime.datetime.utcnow().strftime("%d %B %Y à %H:%M"),
+                },
+                # viewport ajusté en hauteur pour ne rien couper
+                viewport={"width": 700, "height": 600},
+                selector=".card",
+                omit_background=True,
+            )
+        except RuntimeError as e:
+            return await interaction.followup.send(f"❌ Erreur : {e}", ephemeral=True)
+
+        # 5️⃣ Envoi du PNG
         await interaction.followup.send(file=File(BytesIO(png), "profile_stats.png"))
 
 
@@ -9,9 +9,9 @@ from typing import List
 import discord
 from discord import File, app_commands
 from discord.ext import commands
-from playwright.async_api import async_playwright, Error as PWError
 
 from config.mongo import stats_collection
+from config.render import render_pool
 
 logger = logging.getLogger(__name__)
 
@@ -35,35 +35,60 @@ class ChannelStat:
 
 
 class StatsService:
+    """Classements calculés côté Mongo : le coût ne dépend pas de l'historique accumulé."""
+
+    TOP_N = 3
+
     @staticmethod
-    async def fetch_all(guild: discord.Guild) -> dict:
-        docs = await stats_collection.find({"guild_id": guild.id}).to_list(length=None)
+    async def top_users_today(guild: discord.Guild, limit: int = TOP_N) -> list[dict]:
         today_iso = datetime.date.today().isoformat()
-        daily = [d for d in docs if d.get("type") == "daily" and d.get("date") == today_iso]
-        channels = [d for d in docs if d.get("type") == "channel"]
-        return {"daily": daily, "channel": channels}
+        pipeline = [
+            {"$match": {"guild_id": guild.id, "type": "daily", "date": today_iso}},
+            {"$sort": {"msg_count": -1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "user_id": 1, "msg_count": 1, "voice_seconds": 1}},
+        ]
+        return await stats_collection.aggregate(pipeline).to_list(length=limit)
+
+    @staticmethod
+    async def top_channels(guild: discord.Guild, limit: int = TOP_N) -> dict:
+        # Les lignes "channel" sont par membre : on les regroupe par salon avant de classer
+        pipeline = [
+            {"$match": {"guild_id": guild.id, "type": "channel"}},
+            {"$group": {
+                "_id": "$channel_id",
+                "msg_count": {"$sum": {"$ifNull": ["$msg_count", 0]}},
+                "voice_seconds": {"$sum": {"$ifNull": ["$voice_seconds", 0]}},
+            }},
+            {"$facet": {
+                "text": [
+                    {"$match": {"msg_count": {"$gt": 0}}},
+                    {"$sort": {"msg_count": -1}},
+                    {"$limit": limit},
+                ],
+                "voice": [
+                    {"$match": {"voice_seconds": {"$gt": 0}}},
+                    {"$sort": {"voice_seconds": -1}},
+                    {"$limit": limit},
+                ],
+            }},
+        ]
+        result = await stats_collection.aggregate(pipeline).to_list(length=1)
+        return result[0] if result else {"text": [], "voice": []}
 
 
 class StatsRenderer:
     def __init__(self, template_name: str = "server_stats.html"):
-        from jinja2 import Environment, FileSystemLoader, select_autoescape
-
-        env = Environment(
-            loader=FileSystemLoader("templates"),            # dossier templates/
-            autoescape=select_autoescape(["html", "xml"]),
-            trim_blocks=True,
-            lstrip_blocks=True,
-        )
-        self.template = env.get_template(template_name)
+        self.template_name = template_name                   # dossier templates/
 
-    def render_html(
+    def build_context(
         self,
         guild: discord.Guild,
         users: List[UserStat],
         text_ch: List[ChannelStat],
         voice_ch: List[ChannelStat],
-    ) -> str:
-        return self.template.render(
+    ) -> dict:
+        return dict(
             guild_pfp=guild.icon.url if guild.icon else "",
             guild_name=guild.name,
             member_count=guild.member_count,
@@ -73,21 +98,16 @@ class StatsRenderer:
             voice_channels=voice_ch,
         )
 
-    async def to_png(self, html: str) -> bytes:
-        try:
-            async with async_playwright() as pw:
-                browser = await pw.chromium.launch(args=["--no-sandbox"])
-                page = await browser.new_page(viewport={"width": 1902, "height": 1200, "deviceScaleFactor": 3})
-                await page.set_content(html, wait_until="networkidle")
-
-                # full-page capture in case content is larger
-                png = await page.screenshot(omit_background=True, full_page=True)
-                await browser.close()
-                return png
-
-        except PWError as e:
-            logger.exception("Playwright rendering failed")
-            raise RuntimeError("Échec de génération de l’image") from e
+    async def to_png(self, context: dict) -> bytes:
+        # full-page capture in case content is larger ; lève RuntimeError en cas d'échec
+        return await render_pool.render(
+            self.template_name,
+            context,
+            viewport={"width": 1902, "height": 1200},
+            full_page=True,
+            scale=3,
+            omit_background=True,
+        )
 
 
 class ServerStatsCog(commands.Cog):
@@ -105,10 +125,15 @@ class ServerStatsCog(commands.Cog):
         if not guild:
             return await interaction.followup.send("❌ Cette commande doit être utilisée dans un serveur.", ephemeral=True)
 
-        data = await StatsService.fetch_all(guild)
+        # Les compteurs en attente dans le tampon de MemberStats doivent être visibles
+        stats_cog = self.bot.get_cog("MemberStats")
+        if stats_cog:
+            await stats_cog.buffer.flush()
+
+        top_users = await StatsService.top_users_today(guild)
+        channels = await StatsService.top_channels(guild)
 
         # Top 3 users by messages today
-        top_users = sorted(data["daily"], key=lambda d: d.get("msg_count", 0), reverse=True)[:3]
         users_stats: List[UserStat] = []
         for i, doc in enumerate(top_users, start=1):
             member = guild.get_member(doc["user_id"])
@@ -122,35 +147,31 @@ class ServerStatsCog(commands.Cog):
             ))
 
         # Top 3 text channels
-        txt = [d for d in data["channel"] if d.get("msg_count", 0) > 0]
-        top_text = sorted(txt, key=lambda d: d["msg_count"], reverse=True)[:3]
         text_stats: List[ChannelStat] = []
-        for i, doc in enumerate(top_text, start=1):
-            chan = guild.get_channel(doc["channel_id"])
+        for i, doc in enumerate(channels["text"], start=1):
+            chan = guild.get_channel(doc["_id"])
             text_stats.append(ChannelStat(
                 rank=i,
-                name=chan.name if chan else f"#{doc['channel_id']}",
+                name=chan.name if chan else f"#{doc['_id']}",
                 category=(chan.category.name if chan and chan.category else "N/A"),
                 count=doc.get("msg_count", 0),
             ))
 
         # Top 3 voice channels
-        vc = [d for d in data["channel"] if d.get("voice_seconds", 0) > 0]
-        top_voice = sorted(vc, key=lambda d: d["voice_seconds"], reverse=True)[:3]
         voice_stats: List[ChannelStat] = []
-        for i, doc in enumerate(top_voice, start=1):
-            chan = guild.get_channel(doc["channel_id"])
+        for i, doc in enumerate(channels["voice"], start=1):
+            chan = guild.get_channel(doc["_id"])
             voice_stats.append(ChannelStat(
                 rank=i,
-                name=chan.name if chan else f"#{doc['channel_id']}",
+                name=chan.name if chan else f"#{doc['_id']}",
                 category=(chan.category.name if chan and chan.category else "N/A"),
                 count=doc.get("voice_seconds", 0) // 60,
             ))
 
         # Render and screenshot
-        html = self.renderer.render_html(guild, users_stats, text_stats, voice_stats)
+        context = self.renderer.build_context(guild, users_stats, text_stats, voice_stats)
         try:
-            png = await self.renderer.to_png(html)
+            png = await self.renderer.to_png(context)
         except RuntimeError as e:
             return await interaction.followup.send(f"❌ Erreur : {e}", ephemeral=True)
 
@@ -3,6 +3,9 @@ from discord import app_commands
 from discord.ext import commands
 from discord.ui import View, Select
 from datetime import datetime
+import logging
+
+from pymongo import DESCENDING, UpdateOne
 
 from config.params import (
     EMBED_COLOR,
@@ -12,32 +15,43 @@ from config.params import (
     EMOJIS,
 )
 from config.mongo import moderation_collection
-
 # Collection pour les réglages (salon des logs)
-settings_collection = moderation_collection.database['settings']
+from config.mongo import mod_settings_collection as settings_collection
+
+log = logging.getLogger("elda.moderation")
+
+# Une action = un document {guild_id, user_id, action, reason, timestamp, guild_name, moderator_id}
+# (index déclarés dans config/mongo.py)
 
 
 class ModLogView(View):
-    """Vue paginée pour afficher les logs de modération et les compteurs de warns."""
+    """Vue paginée (une entrée par page, lue en base à la demande) avec les compteurs de warns."""
 
-    def __init__(self, entries: list[dict], author_id: int, total_warns: int, guild_warns: int):
+    def __init__(self, query: dict, count: int, author_id: int, total_warns: int, guild_warns: int):
         super().__init__(timeout=180)
-        self.entries = entries
+        self.query = query
+        self.count = count
         self.page = 0
         self.author_id = author_id
         self.total_warns = total_warns
         self.guild_warns = guild_warns
 
-    def make_embed(self) -> discord.Embed:
-        # Clamp de la page pour éviter les IndexError
-        self.page = max(0, min(self.page, len(self.entries) - 1))
-        entry = self.entries[self.page]
+    async def make_embed(self) -> discord.Embed:
+        # Clamp de la page pour éviter de lire au-delà du dernier log
+        self.page = max(0, min(self.page, self.count - 1))
+        entry = await moderation_collection.find_one(
+            self.query, sort=[("timestamp", DESCENDING)], skip=self.page
+        )
         embed = discord.Embed(
             title="📋 Logs de modération",
-            description=f"Page {self.page + 1}/{len(self.entries)}",
+            description=f"Page {self.page + 1}/{self.count}",
             color=EMBED_COLOR,
             timestamp=datetime.utcnow(),
         )
+        if entry is None:   # supprimé entre-temps
+            embed.add_field(name="Action", value="—", inline=False)
+            embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
+            return embed
         embed.add_field(name="Action", value=entry["action"].capitalize(), inline=True)
         embed.add_field(name="Serveur", value=entry["guild_name"], inline=True)
         embed.add_field(name="Warns totaux", value=str(self.total_warns), inline=True)
@@ -58,7 +72,7 @@ class ModLogView(View):
             return await interaction.response.defer()
         if self.page > 0:
             self.page -= 1
-            await interaction.response.edit_message(embed=self.make_embed(), view=self)
+            await interaction.response.edit_message(embed=await self.make_embed(), view=self)
         else:
             await interaction.response.defer()
 
@@ -66,9 +80,9 @@ class ModLogView(View):
     async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.author_id:
             return await interaction.response.defer()
-        if self.page < len(self.entries) - 1:
+        if self.page < self.count - 1:
             self.page += 1
-            await interaction.response.edit_message(embed=self.make_embed(), view=self)
+            await interaction.response.edit_message(embed=await self.make_embed(), view=self)
         else:
             await interaction.response.defer()
 
@@ -79,11 +93,64 @@ class Moderation(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+    async def cog_load(self):
+        await self._migrate_legacy()
+
+    async def _migrate_legacy(self):
+        """
+        Ancien format : un document par utilisateur {_id: user_id, actions: [...]}.
+        Les _id numériques sont triés avant les ObjectId : la requête n'utilise que l'index _id
+        et ne parcourt rien une fois la migration faite.
+        """
+        migrated = 0
+        async for doc in moderation_collection.find({"_id": {"$gte": 0}}):
+            ops = []
+            for a in doc.get("actions", []):
+                entry = {
+                    "guild_id": a["guild_id"],
+                    "user_id": doc["_id"],
+                    "action": a["action"],
+                    "timestamp": a["timestamp"],
+                }
+                # Upsert sur la clé complète : relancer la migration ne crée pas de doublons
+                ops.append(UpdateOne(
+                    entry,
+                    {"$setOnInsert": {"guild_name": a.get("guild_name", ""), "reason": a.get("reason", "")}},
+                    upsert=True
+                ))
+            if ops:
+                await moderation_collection.bulk_write(ops, ordered=False)
+            await moderation_collection.delete_one({"_id": doc["_id"]})
+            migrated += 1
+        if migrated:
+            log.info("Logs de modération migrés pour %d utilisateur(s)", migrated)
+
     mod = app_commands.Group(name="mod", description="Commandes de modération")
 
     def _can_override_hierarchy(self, member: discord.Member) -> bool:
         return member.guild_permissions.manage_guild
 
+    async def _record(self, interaction: discord.Interaction, user_id: int, action: str, reason: str) -> datetime:
+        now = datetime.utcnow()
+        await moderation_collection.insert_one({
+            "guild_id": interaction.guild.id,
+            "user_id": user_id,
+            "action": action,
+            "reason": reason,
+            "timestamp": now,
+            "guild_name": interaction.guild.name,
+            "moderator_id": interaction.user.id,
+        })
+        return now
+
+    async def _warn_counts(self, guild_id: int, user_id: int) -> tuple[int, int]:
+        """(warns tous serveurs, warns sur ce serveur), comptés par index."""
+        total = await moderation_collection.count_documents({"user_id": user_id, "action": "warn"})
+        in_guild = await moderation_collection.count_documents(
+            {"guild_id": guild_id, "user_id": user_id, "action": "warn"}
+        )
+        return total, in_guild
+
     async def _send_log(self, guild: discord.Guild, embed: discord.Embed):
         settings = await settings_collection.find_one({"guild_id": guild.id})
         if settings and settings.get("mod_log_channel"):
@@ -121,18 +188,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        now = datetime.utcnow()
-        await moderation_collection.update_one(
-            {"_id": user.id},
-            {"$push": {"actions": {
-                "guild_id": interaction.guild.id,
-                "guild_name": interaction.guild.name,
-                "action": "ban",
-                "reason": reason,
-                "timestamp": now
-            }}},
-            upsert=True
-        )
+        now = await self._record(interaction, user.id, "ban", reason)
 
         embed_log = discord.Embed(
             title=EMOJIS.get('CHECK', '✅') + " Utilisateur banni",
@@ -173,18 +229,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        now = datetime.utcnow()
-        await moderation_collection.update_one(
-            {"_id": member.id},
-            {"$push": {"actions": {
-                "guild_id": interaction.guild.id,
-                "guild_name": interaction.guild.name,
-                "action": "kick",
-                "reason": reason,
-                "timestamp": now
-            }}},
-            upsert=True
-        )
+        now = await self._record(interaction, member.id, "kick", reason)
 
         embed_log = discord.Embed(
             title=EMOJIS.get('CHECK', '✅') + " Membre expulsé",
@@ -204,23 +249,9 @@ class Moderation(commands.Cog):
         member: discord.Member,
         reason: str
     ):
-        now = datetime.utcnow()
-        await moderation_collection.update_one(
-            {"_id": member.id},
-            {"$push": {"actions": {
-                "guild_id": interaction.guild.id,
-                "guild_name": interaction.guild.name,
-                "action": "warn",
-                "reason": reason,
-                "timestamp": now
-            }}},
-            upsert=True
-        )
+        now = await self._record(interaction, member.id, "warn", reason)
 
-        doc = await moderation_collection.find_one({"_id": member.id})
-        all_warns = [a for a in doc['actions'] if a['action'] == 'warn']
-        total_warns = len(all_warns)
-        guild_warns = len([a for a in all_warns if a['guild_id'] == interaction.guild.id])
+        total_warns, guild_warns = await self._warn_counts(interaction.guild.id, member.id)
 
         title = EMOJIS.get('CHECK', '✅') + f" Avertissement #{guild_warns}"
         desc = f"{member.mention} averti pour :\n> {reason}"
@@ -246,17 +277,7 @@ class Moderation(commands.Cog):
 
         if guild_warns >= 3:
             await interaction.guild.kick(member, reason="3 warns atteints")
-            now_kick = datetime.utcnow()
-            await moderation_collection.update_one(
-                {"_id": member.id},
-                {"$push": {"actions": {
-                    "guild_id": interaction.guild.id,
-                    "guild_name": interaction.guild.name,
-                    "action": "kick",
-                    "reason": "3 warns atteints",
-                    "timestamp": now_kick
-                }}}
-            )
+            now_kick = await self._record(interaction, member.id, "kick", "3 warns atteints")
             embed_kick = discord.Embed(
                 title=EMOJIS.get('CHECK', '✅') + " Membre expulsé",
                 description=f"{member.mention} expulsé après 3 warns.",
@@ -273,23 +294,11 @@ class Moderation(commands.Cog):
         interaction: discord.Interaction,
         member: discord.Member
     ):
-        await moderation_collection.update_one(
-            {"_id": member.id},
-            {"$pull": {"actions": {"action": "warn", "guild_id": interaction.guild.id}}}
-        )
-        doc = await moderation_collection.find_one({"_id": member.id})
-        remaining = len([a for a in doc.get('actions', []) if a['action'] == 'warn' and a['guild_id'] == interaction.guild.id])
-        now = datetime.utcnow()
-        await moderation_collection.update_one(
-            {"_id": member.id},
-            {"$push": {"actions": {
-                "guild_id": interaction.guild.id,
-                "guild_name": interaction.guild.name,
-                "action": "warn-reset",
-                "reason": "Réinitialisation des warns",
-                "timestamp": now
-            }}}
+        await moderation_collection.delete_many(
+            {"guild_id": interaction.guild.id, "user_id": member.id, "action": "warn"}
         )
+        _, remaining = await self._warn_counts(interaction.guild.id, member.id)
+        now = await self._record(interaction, member.id, "warn-reset", "Réinitialisation des warns")
 
         embed_log = discord.Embed(
             title=EMOJIS.get('CHECK', '✅') + " Warns réinitialisés",
@@ -312,8 +321,11 @@ class Moderation(commands.Cog):
         interaction: discord.Interaction,
         member: discord.Member
     ):
-        doc = await moderation_collection.find_one({"_id": member.id})
-        if not doc or not doc.get('actions'):
+        query = {"user_id": member.id, "action": {"$in": ["kick", "ban"]}}
+        count = await moderation_collection.count_documents(query)
+        total_warns, guild_warns = await self._warn_counts(interaction.guild.id, member.id)
+
+        if not count and not total_warns:
             embed = discord.Embed(
                 title=EMOJIS.get('INFO', 'ℹ️') + " Aucun log trouvé",
                 description=f"Aucun log pour {member.mention}.",
@@ -322,16 +334,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        all_warns = [a for a in doc['actions'] if a['action'] == 'warn']
-        total_warns = len(all_warns)
-        guild_warns = len([a for a in all_warns if a['guild_id'] == interaction.guild.id])
-
-        entries = sorted(
-            [a for a in doc['actions'] if a['action'] in ('kick', 'ban')],
-            key=lambda a: a['timestamp'],
-            reverse=True
-        )
-        if not entries:
+        if not count:
             embed = discord.Embed(
                 title=EMOJIS.get('INFO', 'ℹ️') + " Aucun kick/ban trouvé",
                 description=f"{member.mention} n'a subi aucun kick ni ban sur ce serveur.",
@@ -340,8 +343,8 @@ class Moderation(commands.Cog):
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        view = ModLogView(entries, interaction.user.id, total_warns, guild_warns)
-        await interaction.response.send_message(embed=view.make_embed(), view=view, ephemeral=True)
+        view = ModLogView(query, count, interaction.user.id, total_warns, guild_warns)
+        await interaction.response.send_message(embed=await view.make_embed(), view=view, ephemeral=True)
 
     @mod.command(name="setup", description="Configure le salon des logs de modération.")
     @app_commands.default_permissions(administrator=True)
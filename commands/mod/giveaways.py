@@ -1,11 +1,12 @@
 import asyncio
+import logging
 import re
 import random
 from datetime import datetime, timedelta, timezone
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ui import Modal, TextInput, View, ChannelSelect, Button
 
 from config.params import (
@@ -14,6 +15,9 @@ from config.params import (
     EMBED_FOOTER_ICON_URL,
 )
 from config.mongo import giveaways_collection
+from config.scheduler import DeadlineScheduler
+
+log = logging.getLogger("elda.giveaways")
 
 # Regex pour custom emoji Discord <:name:id> ou <a:name:id>
 _EMOJI_RE = re.compile(r'<(a?):(\w+):(\d+)>')
@@ -108,6 +112,7 @@ class GiveawayModal(Modal, title="📢 Lancer un Giveaway"):
                 data["channel_id"] = chan.id
 
                 end_time = data["created_at"] + duration_delta
+                data["ends_at"] = end_time
                 ts = int(end_time.timestamp())
                 # Embed initial
                 embed = discord.Embed(
@@ -130,32 +135,8 @@ class GiveawayModal(Modal, title="📢 Lancer un Giveaway"):
                 await giveaways_collection.insert_one(data)
                 await select_inter.response.edit_message(content=f"✅ Giveaway créé dans {chan.mention}!", view=None)
 
-                # Auto-finish du giveaway
-                async def finish_giveaway():
-                    await asyncio.sleep(duration_delta.total_seconds())
-                    parts = data["participants"]
-                    if len(parts) < data["winners"]:
-                        await chan.send("⚠️ Giveaway terminé, pas assez de participants.")
-                        try:
-                            await msg.edit(view=view.make_reroll_only())
-                        except discord.NotFound:
-                            pass
-                        return
-                    winners = random.sample(parts, data["winners"])
-                    mentions = " ".join(f"<@{w}>" for w in winners)
-                    await chan.send(f"🎊 {mentions}, félicitations !")
-                    embed_fin = msg.embeds[0]
-                    embed_fin.add_field(name="🎊 Gagnants", value=mentions, inline=False)
-                    try:
-                        await msg.edit(embed=embed_fin, view=view.make_reroll_only())
-                    except discord.NotFound:
-                        pass
-                    await giveaways_collection.update_one(
-                        {"_id": data["_id"]},
-                        {"$set": {"winners_list": winners}}
-                    )
-
-                asyncio.create_task(finish_giveaway())
+                # Fin automatique : le planificateur du cog se réveille à l'échéance
+                select_inter.client.get_cog("GiveawayCog").scheduler.schedule(end_time, data["_id"])
 
         # Envoi du select
         select_view = View(timeout=None)
@@ -257,25 +238,30 @@ class GiveawayView(View):
         if len(parts) < self.data["winners"]:
             return await interaction.response.send_message("⚠️ Pas assez de participants.", ephemeral=True)
         winners = random.sample(parts, self.data["winners"])
+        # `ended` posé atomiquement avant le tirage : l'échéance (ou un double clic) ne tire pas une deuxième fois
+        claimed = await giveaways_collection.find_one_and_update(
+            {"_id": self.data["_id"], "ended": {"$ne": True}},
+            {"$set": {"winners_list": winners, "ended": True}}
+        )
+        if claimed is None:
+            return await interaction.response.send_message("⚠️ Ce giveaway a déjà été tiré.", ephemeral=True)
         mentions = " ".join(f"<@{w}>" for w in winners)
         await interaction.channel.send(f"🎊 {mentions}, félicitations !")
         msg = interaction.message
         embed = msg.embeds[0]
         embed.add_field(name="🎊 Gagnants", value=mentions, inline=False)
         await msg.edit(embed=embed, view=self.make_reroll_only())
-        await giveaways_collection.update_one({"_id": self.data["_id"]}, {"$set": {"winners_list": winners}})
         await interaction.response.send_message("✅ Tirage effectué.", ephemeral=True)
 
 
 class GiveawayCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.cleanup_expired.start()
+        self.scheduler = DeadlineScheduler(self.end_giveaway, name="giveaways")
 
-    @tasks.loop(seconds=60)
-    async def cleanup_expired(self):
-        now = datetime.now(timezone.utc)
-        async for gw in giveaways_collection.find({}):
+    async def cog_load(self):
+        # Migration : anciens giveaways sans `ends_at` (calculé une fois depuis `duration`)
+        async for gw in giveaways_collection.find({"ends_at": {"$exists": False}}):
             created = gw.get("created_at")
             if created and created.tzinfo is None:
                 created = created.replace(tzinfo=timezone.utc)
@@ -283,12 +269,54 @@ class GiveawayCog(commands.Cog):
                 end = created + parse_duration(gw["duration"])
             except Exception:
                 continue
-            if end < now:
-                await giveaways_collection.delete_one({"_id": gw["_id"]})
-
-    @cleanup_expired.before_loop
-    async def before_cleanup(self):
-        await self.bot.wait_until_ready()
+            await giveaways_collection.update_one({"_id": gw["_id"]}, {"$set": {"ends_at": end}})
+        # Chargement des échéances en cours dans le tas, triées par l'index
+        async for gw in giveaways_collection.find({"ends_at": {"$ne": None}}, {"ends_at": 1}).sort("ends_at", 1):
+            self.scheduler.schedule(gw["ends_at"], gw["_id"])
+        self.scheduler.start()
+
+    def cog_unload(self):
+        self.scheduler.stop()
+
+    async def end_giveaway(self, giveaway_id: int):
+        """Échéance atteinte : tirage automatique (si pas déjà fait) puis nettoyage du document."""
+        await self.bot.wait_until_ready()   # échéances dépassées pendant un redémarrage
+        # Marquage atomique : un tirage manuel ou un doublon dans le tas ne relance rien
+        gw = await giveaways_collection.find_one_and_update(
+            {"_id": giveaway_id, "ended": {"$ne": True}},
+            {"$set": {"ended": True}}
+        )
+        try:
+            if gw:
+                await self._draw(gw)
+        except discord.HTTPException:
+            log.exception("Tirage du giveaway %s impossible (salon ou message inaccessible)", giveaway_id)
+        finally:
+            # Nettoyage dans tous les cas : un document `ended` ne serait plus jamais repris
+            await giveaways_collection.delete_one({"_id": giveaway_id})
+
+    async def _draw(self, gw: dict):
+        chan = self.bot.get_channel(gw["channel_id"])
+        if chan is None:
+            return
+        try:
+            msg = await chan.fetch_message(gw["_id"])
+        except discord.NotFound:
+            msg = None
+        view = GiveawayView(gw, gw["ends_at"].replace(tzinfo=timezone.utc))
+        parts = gw.get("participants", [])
+        if len(parts) < gw["winners"]:
+            await chan.send("⚠️ Giveaway terminé, pas assez de participants.")
+            if msg:
+                await msg.edit(view=view.make_reroll_only())
+            return
+        winners = random.sample(parts, gw["winners"])
+        mentions = " ".join(f"<@{w}>" for w in winners)
+        await chan.send(f"🎊 {mentions}, félicitations !")
+        if msg:
+            embed_fin = msg.embeds[0]
+            embed_fin.add_field(name="🎊 Gagnants", value=mentions, inline=False)
+            await msg.edit(embed=embed_fin, view=view.make_reroll_only())
 
     @app_commands.command(name="giveaway", description="Créer un nouveau giveaway")
     @app_commands.default_permissions(ban_members=True)
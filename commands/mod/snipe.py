@@ -2,9 +2,13 @@
 # utiles si vous n'aviez pas programé de log pour sa.
 # je juge ce code complété.
 import datetime
+import os
+import time
+from collections import OrderedDict, deque
+
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from config.params import (
     EMBED_COLOR,
     EMBED_FOOTER_TEXT,
@@ -12,32 +16,142 @@ from config.params import (
     MESSAGES,
 )
 
+SNIPE_PER_CHANNEL = int(os.getenv("SNIPE_PER_CHANNEL", 10))            # suppressions gardées par salon
+SNIPE_GUILD_BYTES = int(os.getenv("SNIPE_GUILD_BYTES", 256 * 1024))    # budget par serveur
+SNIPE_MAX_BYTES   = int(os.getenv("SNIPE_MAX_BYTES", 8 * 1024 * 1024)) # budget global
+SNIPE_TTL         = float(os.getenv("SNIPE_TTL", 6 * 3600))            # secondes
+
+RECORD_OVERHEAD = 200   # estimation de l'objet + slots + deque, en octets
+
+
+class SnipeRecord:
+    """Copie compacte d'un message supprimé (aucune référence vers les objets discord.py)."""
+
+    __slots__ = ("author_id", "author_name", "avatar_url", "content", "attachments", "deleted_at", "size")
+
+    def __init__(self, message: discord.Message):
+        self.author_id = message.author.id
+        self.author_name = str(message.author)
+        self.avatar_url = message.author.display_avatar.url
+        self.content = message.content
+        self.attachments = tuple(a.url for a in message.attachments)
+        self.deleted_at = time.time()
+        self.size = (
+            RECORD_OVERHEAD
+            + len(self.author_name) + len(self.avatar_url) + len(self.content)
+            + sum(len(url) for url in self.attachments)
+        )
+
+
+class SnipeStore:
+    """
+    Ring buffer de suppressions par salon, borné par serveur et globalement (LRU en octets),
+    avec expiration TTL. Les serveurs et salons sont rangés du moins au plus récemment actif.
+    """
+
+    def __init__(self):
+        # guild_id -> (channel_id -> deque[SnipeRecord], du plus ancien au plus récent)
+        self._guilds: OrderedDict[int, OrderedDict[int, deque]] = OrderedDict()
+        self._guild_bytes: dict[int, int] = {}
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return sum(len(d) for channels in self._guilds.values() for d in channels.values())
+
+    def add(self, guild_id: int, channel_id: int, record: SnipeRecord) -> None:
+        channels = self._guilds.setdefault(guild_id, OrderedDict())
+        self._guilds.move_to_end(guild_id)
+        history = channels.setdefault(channel_id, deque())
+        channels.move_to_end(channel_id)
+
+        if len(history) >= SNIPE_PER_CHANNEL:
+            self._account(guild_id, -history.popleft().size)
+        history.append(record)
+        self._account(guild_id, record.size)
+
+        while self._guild_bytes.get(guild_id, 0) > SNIPE_GUILD_BYTES:
+            self._evict_oldest(guild_id)
+        while self.bytes > SNIPE_MAX_BYTES and self._guilds:
+            self._evict_oldest(next(iter(self._guilds)))
+
+    def get(self, channel_id: int, guild_id: int) -> list[SnipeRecord]:
+        """Suppressions non expirées du salon, de la plus récente à la plus ancienne."""
+        channels = self._guilds.get(guild_id)
+        history = channels.get(channel_id) if channels else None
+        if not history:
+            return []
+        self._expire(guild_id, channel_id, time.time() - SNIPE_TTL)
+        return list(reversed(history))
+
+    def purge_expired(self) -> None:
+        cutoff = time.time() - SNIPE_TTL
+        for guild_id, channels in list(self._guilds.items()):
+            for channel_id in list(channels):
+                self._expire(guild_id, channel_id, cutoff)
+
+    def _expire(self, guild_id: int, channel_id: int, cutoff: float) -> None:
+        history = self._guilds[guild_id][channel_id]
+        while history and history[0].deleted_at < cutoff:
+            self._account(guild_id, -history.popleft().size)
+        self._drop_if_empty(guild_id, channel_id)
+
+    def _evict_oldest(self, guild_id: int) -> None:
+        # Enregistrement le plus ancien du salon le moins récemment actif du serveur
+        channels = self._guilds[guild_id]
+        channel_id, history = next(iter(channels.items()))
+        self._account(guild_id, -history.popleft().size)
+        self._drop_if_empty(guild_id, channel_id)
+
+    def _drop_if_empty(self, guild_id: int, channel_id: int) -> None:
+        channels = self._guilds[guild_id]
+        if not channels[channel_id]:
+            del channels[channel_id]
+        if not channels:
+            del self._guilds[guild_id]
+            self._guild_bytes.pop(guild_id, None)
+
+    def _account(self, guild_id: int, delta: int) -> None:
+        self._guild_bytes[guild_id] = self._guild_bytes.get(guild_id, 0) + delta
+        self.bytes += delta
+
+
 class Snipe(commands.Cog):
-    """Récupère et affiche le dernier message supprimé dans un salon."""
+    """Récupère et affiche les derniers messages supprimés dans un salon."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # Mapping channel_id -> (Message, deletion_time)
-        if not hasattr(bot, "deleted_messages"):
-            bot.deleted_messages: dict[int, tuple[discord.Message, datetime.datetime]] = {}
+        # Conservé sur le bot pour survivre à un rechargement du cog
+        if not hasattr(bot, "snipe_store"):
+            bot.snipe_store = SnipeStore()
+        self.store: SnipeStore = bot.snipe_store
+        self.purge.start()
+
+    async def cog_unload(self):
+        self.purge.cancel()
+
+    @tasks.loop(minutes=10)
+    async def purge(self):
+        # Libère la mémoire des salons qui ne sont plus consultés
+        self.store.purge_expired()
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         # Ignorez les suppressions en DM
         if message.guild is None:
             return
-        # Stocke le message + timestamp local
-        self.bot.deleted_messages[message.channel.id] = (
-            message,
-            datetime.datetime.now()
-        )
+        self.store.add(message.guild.id, message.channel.id, SnipeRecord(message))
 
     @app_commands.command(
         name="snipe",
-        description="Récupère le dernier message supprimé de ce salon."
+        description="Récupère un message supprimé récemment dans ce salon."
     )
+    @app_commands.describe(index="1 = dernier message supprimé, 2 = l'avant-dernier, etc.")
     @app_commands.default_permissions(ban_members=True)
-    async def snipe(self, interaction: discord.Interaction):
+    async def snipe(
+        self,
+        interaction: discord.Interaction,
+        index: app_commands.Range[int, 1, SNIPE_PER_CHANNEL] = 1
+    ):
         # Vérification de permission
         if not interaction.user.guild_permissions.ban_members:
             embed = discord.Embed(
@@ -48,38 +162,45 @@ class Snipe(commands.Cog):
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        # Défer pour pouvoir follow-up
-        await interaction.response.defer()
-
-        entry = self.bot.deleted_messages.get(interaction.channel.id)
-        if not entry:
+        history = self.store.get(interaction.channel.id, interaction.guild.id)
+        if len(history) < index:
             embed = discord.Embed(
-                description="🚫 Aucun message supprimé trouvé dans ce salon.",
+                description=(
+                    "🚫 Aucun message supprimé trouvé dans ce salon."
+                    if not history else
+                    f"🚫 Seulement **{len(history)}** message(s) supprimé(s) en mémoire pour ce salon."
+                ),
                 color=EMBED_COLOR
             )
             embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
-            return await interaction.followup.send(embed=embed, ephemeral=True)
+            return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        msg, deleted_at = entry
+        record = history[index - 1]
 
         # Construction de l'embed résultat
         embed = discord.Embed(
             color=EMBED_COLOR,
-            description=msg.content or "_(Pas de contenu textuel)_"
+            description=record.content or "_(Pas de contenu textuel)_"
         )
         embed.set_author(
-            name=f"{msg.author} ({msg.author.id})",
-            icon_url=msg.author.display_avatar.url
+            name=f"{record.author_name} ({record.author_id})",
+            icon_url=record.avatar_url
         )
+        if record.attachments:
+            embed.add_field(
+                name="📎 Pièces jointes",
+                value="\n".join(record.attachments)[:1024],
+                inline=False
+            )
 
-        # Footer avec heure de suppression (locale)
-        time_str = deleted_at.strftime("%H:%M:%S")
+        # Footer avec heure de suppression (locale) et position dans l'historique
+        time_str = datetime.datetime.fromtimestamp(record.deleted_at).strftime("%H:%M:%S")
         embed.set_footer(
-            text=f"{EMBED_FOOTER_TEXT} • Supprimé à {time_str}",
+            text=f"{EMBED_FOOTER_TEXT} • Supprimé à {time_str} • {index}/{len(history)}",
             icon_url=EMBED_FOOTER_ICON_URL
         )
 
-        await interaction.followup.send(embed=embed)
+        await interaction.response.send_message(embed=embed)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Snipe(bot))
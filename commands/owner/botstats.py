@@ -12,6 +12,7 @@ from config.params import (
     EMBED_FOOTER_ICON_URL,
     BOT_OWNER_ID,
 )
+from config.mongo import mongo_health
 
 # Logger configuration
 logger = logging.getLogger(__name__)
@@ -37,6 +38,23 @@ def build_stats_embed(view: "BotStatPaginationView") -> Embed:
     # Informations générales
     embed.add_field(name="🌐 Serveurs totaux", value=str(total_servers), inline=True)
     embed.add_field(name="👥 Membres totaux", value=str(total_members), inline=True)
+    stats_cog = view.bot.get_cog("MemberStats")
+    if stats_cog:
+        buffer = stats_cog.buffer
+        embed.add_field(
+            name="📝 Tampon stats",
+            value=f"{buffer.depth} en attente • max {buffer.max_depth} • dernier flush {buffer.last_flush_ms:.0f} ms",
+            inline=True
+        )
+    if mongo_health["ok"] is None:
+        mongo_value = "Pas encore mesuré"
+    elif mongo_health["ok"]:
+        mongo_value = f"🟢 {mongo_health['latency_ms']:.0f} ms"
+    else:
+        mongo_value = "🔴 Injoignable"
+    if mongo_health["failures"]:
+        mongo_value += f" • {mongo_health['failures']} échec(s) de ping"
+    embed.add_field(name="🍃 MongoDB", value=mongo_value, inline=True)
     embed.add_field(name="────", value="────", inline=False)
 
     # Détail des serveurs
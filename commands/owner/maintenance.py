@@ -1,7 +1,13 @@
 import discord
 from discord import Embed, app_commands
 from discord.ext import commands
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import time
+
+from bson import ObjectId
 
 from config.params import (
     EMBED_COLOR,
@@ -9,6 +15,14 @@ from config.params import (
     EMBED_FOOTER_ICON_URL,
     BOT_OWNER_ID,
 )
+from config.mongo import broadcast_deliveries_collection
+
+log = logging.getLogger("elda.maintenance")
+
+# Chaque salon a son propre bucket Discord : la limite réelle est la limite globale (~50 req/s)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 10))
+BROADCAST_RETRIES     = 3      # tentatives par serveur (erreurs 5xx / réseau uniquement)
+PROGRESS_INTERVAL     = 3.0    # secondes entre deux mises à jour de l'embed de progression
 
 # Contrôle d'accès : uniquement le propriétaire
 def is_owner(interaction: discord.Interaction) -> bool:
@@ -22,11 +36,134 @@ ANNOUNCE_TYPES = {
     "changement":  "🔄 Changement",
 }
 
+
+def pick_channel(guild: discord.Guild) -> discord.TextChannel | None:
+    """system_channel ou premier canal texte envoyable."""
+    me = guild.me
+    if guild.system_channel and guild.system_channel.permissions_for(me).send_messages:
+        return guild.system_channel
+    return discord.utils.find(
+        lambda c: c.permissions_for(me).send_messages,
+        guild.text_channels
+    )
+
+
+class Broadcast:
+    """Diffusion d'un embed dans tous les serveurs, en tâche de fond, avec journal par serveur."""
+
+    def __init__(self, bot: commands.Bot, embed: Embed, kind: str):
+        self.bot = bot
+        self.id = ObjectId()
+        self.embed = embed
+        self.kind = kind
+        self.total = len(bot.guilds)
+        self.sent = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.finished = False
+        self.interrupted = False     # run() annulé ou en erreur avant la fin
+        self._log: list[dict] = []   # livraisons pas encore écrites dans Mongo
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed
+
+    async def run(self):
+        # 1️⃣ Résolution des salons en amont (cache uniquement, aucune requête)
+        targets = []
+        for guild in self.bot.guilds:
+            channel = pick_channel(guild)
+            if channel is None:
+                self._record(guild, None, "failed", 0, "aucun salon envoyable")
+            else:
+                targets.append((guild, channel))
+
+        # 2️⃣ Envois concurrents bornés
+        slots = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+        async def deliver(guild, channel):
+            async with slots:
+                await self._send(guild, channel)
+
+        await asyncio.gather(*(deliver(g, c) for g, c in targets))
+        self.finished = True
+        await self.flush_log()
+
+    async def _send(self, guild: discord.Guild, channel: discord.TextChannel):
+        error = None
+        for attempt in range(1, BROADCAST_RETRIES + 1):
+            try:
+                msg = await channel.send(embed=self.embed)
+                self._record(guild, channel, "sent", attempt, message_id=msg.id)
+                return
+            except (discord.Forbidden, discord.NotFound) as e:
+                error = f"{e.status} {e.text}"
+                break                                   # inutile de réessayer
+            except discord.HTTPException as e:
+                error = f"{e.status} {e.text}"
+                if e.status < 500:
+                    break
+            except (OSError, asyncio.TimeoutError) as e:
+                error = repr(e)
+            if attempt < BROADCAST_RETRIES:
+                await asyncio.sleep(2 ** (attempt - 1))   # 1s, 2s, …
+        self._record(guild, channel, "failed", attempt, error)
+
+    def _record(self, guild, channel, status, attempts, error=None, message_id=None):
+        if status == "sent":
+            self.sent += 1
+        else:
+            self.failed += 1
+        self._log.append({
+            "broadcast_id": self.id,
+            "kind": self.kind,
+            "guild_id": guild.id,
+            "channel_id": channel.id if channel else None,
+            "message_id": message_id,
+            "status": status,
+            "attempts": attempts,
+            "error": error,
+            "at": datetime.utcnow(),
+        })
+
+    async def flush_log(self):
+        batch, self._log = self._log, []
+        if not batch:
+            return
+        try:
+            await broadcast_deliveries_collection.insert_many(batch, ordered=False)
+        except Exception:
+            log.exception("Impossible d'écrire le journal de diffusion %s", self.id)
+
+    def build_embed(self) -> Embed:
+        elapsed = time.monotonic() - self.started
+        if self.interrupted:
+            title = "⚠️ Diffusion interrompue"
+            eta = f"arrêté après {timedelta(seconds=int(elapsed))}"
+        elif self.finished:
+            title = "✅ Diffusion terminée"
+            eta = f"terminé en {timedelta(seconds=int(elapsed))}"
+        else:
+            title = "📡 Diffusion en cours…"
+            eta = (
+                str(timedelta(seconds=int((self.total - self.done) * elapsed / self.done)))
+                if self.done else "Calcul en cours…"
+            )
+        embed = Embed(title=title, color=EMBED_COLOR)
+        embed.add_field(name="Progression", value=f"{self.done}/{self.total}", inline=True)
+        embed.add_field(name="✅ Envoyés", value=str(self.sent), inline=True)
+        embed.add_field(name="❌ Échecs", value=str(self.failed), inline=True)
+        embed.add_field(name="ETA", value=eta, inline=True)
+        embed.set_footer(text=f"{EMBED_FOOTER_TEXT} • diffusion {self.id}", icon_url=EMBED_FOOTER_ICON_URL)
+        return embed
+
+
 class MaintenanceCog(commands.Cog):
     """Commande /maintenance pour diffuser un message important dans tous les serveurs"""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.current: Broadcast | None = None
 
     @app_commands.command(
         name="maintenance",
@@ -52,6 +189,11 @@ class MaintenanceCog(commands.Cog):
         message: str
     ):
         """Diffuse un embed uniforme (couleur du bot) dans chaque serveur."""
+        if self.current and not self.current.finished:
+            return await interaction.response.send_message(
+                "⏳ Une diffusion est déjà en cours.", ephemeral=True
+            )
+
         title = ANNOUNCE_TYPES[type.value]
         embed = Embed(
             title=title,
@@ -61,36 +203,33 @@ class MaintenanceCog(commands.Cog):
         )
         embed.set_footer(text=EMBED_FOOTER_TEXT, icon_url=EMBED_FOOTER_ICON_URL)
 
-        sent, failed = 0, 0
-        for guild in self.bot.guilds:
-            # Sélection du canal : system_channel ou premier canal texte envoyable
-            channel = (
-                guild.system_channel
-                if guild.system_channel and guild.system_channel.permissions_for(guild.me).send_messages
-                else discord.utils.find(
-                    lambda c: (
-                        isinstance(c, discord.TextChannel)
-                        and c.permissions_for(guild.me).send_messages
-                    ),
-                    guild.text_channels
-                )
-            )
-            if not channel:
-                failed += 1
-                continue
+        # Réponse immédiate, la diffusion continue en arrière-plan
+        broadcast = Broadcast(self.bot, embed, type.value)
+        self.current = broadcast
+        await interaction.response.send_message(embed=broadcast.build_embed(), ephemeral=True)
+        self.bot.loop.create_task(self._run(interaction, broadcast))
 
+    async def _run(self, interaction: discord.Interaction, broadcast: Broadcast):
+        task = asyncio.create_task(broadcast.run())
+        while not task.done():
+            await asyncio.wait({task}, timeout=PROGRESS_INTERVAL)
+            await broadcast.flush_log()
             try:
-                await channel.send(embed=embed)
-                sent += 1
-            except Exception:
-                failed += 1
-
-        # Retour au propriétaire
-        await interaction.response.send_message(
-            f"✅ Message envoyé sur **{sent}** serveurs."
-            + (f" ❌ Échecs sur **{failed}** serveurs." if failed else ""),
-            ephemeral=True
-        )
+                await interaction.edit_original_response(embed=broadcast.build_embed())
+            except discord.HTTPException:
+                pass   # token expiré (15 min) : le journal Mongo reste la référence
+        if task.cancelled() or task.exception():
+            if task.cancelled():
+                log.warning("Diffusion %s annulée", broadcast.id)
+            else:
+                log.error("Diffusion %s interrompue", broadcast.id, exc_info=task.exception())
+            broadcast.finished = broadcast.interrupted = True
+            # État final : sans cette édition l'opérateur garde l'embed « en cours »
+            await broadcast.flush_log()
+            try:
+                await interaction.edit_original_response(embed=broadcast.build_embed())
+            except discord.HTTPException:
+                pass
 
     @maintenance.error
     async def maintenance_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
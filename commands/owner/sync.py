@@ -0,0 +1,50 @@
+# commands/owner/sync.py
+import discord
+from discord.ext import commands
+
+
+class SyncCog(commands.Cog):
+    """Commande owner pour forcer la synchronisation des slash commands."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.command(
+        name="sync",
+        help="(Owner only) Force la synchronisation des slash commands avec Discord."
+    )
+    @commands.is_owner()
+    async def sync(self, ctx: commands.Context):
+        """
+        - Au démarrage, le bot ne synchronise que si l'empreinte de l'arbre a changé.
+        - Cette commande ignore l'empreinte et synchronise dans tous les cas.
+        """
+        async with ctx.typing():
+            synced = await self.bot.sync_tree(force=True)
+        # Nombre renvoyé par Discord, pas celui de l'arbre local
+        await ctx.reply(
+            f"✅ {len(synced)} slash command(s) synchronisée(s).",
+            mention_author=False
+        )
+
+    @sync.error
+    async def sync_error(self, ctx: commands.Context, error: commands.CommandError):
+        """Gestion des erreurs pour la commande sync."""
+        if isinstance(error, commands.NotOwner):
+            await ctx.reply(
+                "❌ Vous n'avez pas la permission d'utiliser cette commande.",
+                mention_author=False
+            )
+        elif isinstance(error, commands.CommandInvokeError) and isinstance(error.original, discord.HTTPException):
+            await ctx.reply(
+                f"❌ Discord a refusé la synchronisation : {error.original}",
+                mention_author=False
+            )
+        else:
+            await ctx.reply(
+                f"❌ Une erreur est survenue : {error}",
+                mention_author=False
+            )
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(SyncCog(bot))
@@ -0,0 +1,79 @@
+# config/cache.py
+# Cache mémoire des configurations par serveur, pour les listeners appelés à chaque événement
+# (messages, présences, vocal). Les commandes de configuration invalident l'entrée après écriture.
+import asyncio
+import os
+import time
+
+from config.mongo import (
+    images_only_collection,
+    soutien_collection,
+    custom_voc_collection,
+    confession_collection,
+    ticket_collection,
+)
+
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", 300))   # secondes
+
+
+class GuildConfigCache:
+    """Document de config par serveur servi depuis la mémoire, avec TTL et cache négatif."""
+
+    def __init__(self, collection, key: str = "_id", ttl: float = CONFIG_CACHE_TTL, query: dict | None = None):
+        self.collection = collection
+        self.key = key
+        self.query = query or {}   # filtre fixe pour les collections partagées (ex. {"kind": "config"})
+        self.ttl = ttl
+        # guild_id -> (expiration monotonic, document ou None si pas de config)
+        self._entries: dict[int, tuple[float, object]] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+        self._versions: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, guild_id: int):
+        entry = self._entries.get(guild_id)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        # Une seule requête Mongo même si plusieurs événements arrivent en même temps
+        future = self._loading.get(guild_id)
+        if future is None:
+            future = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = future
+            future.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(future)
+
+    async def _load(self, guild_id: int):
+        version = self._versions.get(guild_id, 0)
+        value = await self.fetch(guild_id)
+        # Une invalidation pendant la requête rend le résultat périmé : on ne le garde pas
+        if self._versions.get(guild_id, 0) == version:
+            self._entries[guild_id] = (time.monotonic() + self.ttl, value)
+        return value
+
+    async def fetch(self, guild_id: int):
+        """Charge la valeur depuis Mongo (surchargeable pour les caches dérivés)."""
+        return await self.collection.find_one({**self.query, self.key: guild_id})
+
+    def invalidate(self, guild_id: int) -> None:
+        """À appeler après chaque écriture de la config du serveur."""
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+        self._entries.pop(guild_id, None)
+
+
+class BlockedUsersCache(GuildConfigCache):
+    """Ensemble des user_id bloqués d'un serveur (un document par blocage)."""
+
+    async def fetch(self, guild_id: int) -> frozenset[int]:
+        cursor = self.collection.find({**self.query, self.key: guild_id}, {"user_id": 1, "_id": 0})
+        return frozenset([doc["user_id"] async for doc in cursor])
+
+
+images_only_cache = GuildConfigCache(images_only_collection)
+soutien_cache     = GuildConfigCache(soutien_collection)
+custom_voc_cache  = GuildConfigCache(custom_voc_collection, key="guild_id")
+confession_cache  = GuildConfigCache(confession_collection, key="guild_id", query={"kind": "config"})
+confession_blocked_cache = BlockedUsersCache(confession_collection, key="guild_id", query={"kind": "block"})
+ticket_config_cache = GuildConfigCache(ticket_collection, key="guild_id", query={"kind": "config"})
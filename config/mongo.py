@@ -1,12 +1,45 @@
 # config/mongo.py
 # je juge ce code complété
+# Client Mongo unique du process (elda.py et tous les cogs passent par ici),
+# index déclarés au même endroit que les collections, et mesure de santé (ping).
+import asyncio
+import logging
 import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+load_dotenv()
+
+log = logging.getLogger("elda.mongo")
 
 MONGO_URI     = os.getenv("MONGO_URI")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
 
-mongo_client = AsyncIOMotorClient(MONGO_URI)
+MONGO_MAX_POOL   = int(os.getenv("MONGO_MAX_POOL", 50))
+MONGO_MIN_POOL   = int(os.getenv("MONGO_MIN_POOL", 0))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5000))       # sélection serveur + connexion
+MONGO_SOCKET_MS  = int(os.getenv("MONGO_SOCKET_MS", 20000))       # opération la plus longue tolérée
+
+
+def create_client(uri: str | None = MONGO_URI) -> AsyncIOMotorClient:
+    """Fabrique du client : une seule instance par process, réglages via l'environnement."""
+    return AsyncIOMotorClient(
+        uri,
+        appname="elda",
+        maxPoolSize=MONGO_MAX_POOL,
+        minPoolSize=MONGO_MIN_POOL,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_MS,
+    )
+
+
+mongo_client = create_client()
 db           = mongo_client[DATABASE_NAME]
 
 # Collection pour la config “soutien”
@@ -19,11 +52,119 @@ role_panel_collection = db["role_panels"]
 giveaways_collection = db["giveaways"]
 suggestions_collection = db["suggestions"]
 stats_collection = db["stats"]
-profile_collection = db["profiles"] 
+profile_collection = db["profiles"]
 moderation_collection = db["moderation_logs"]
+mod_settings_collection = db["settings"]
 custom_voc_collection = db["custom_voc_configs"]
 afk_collection = db["afk"]
 challenges_collection = db["challenges"]
 ideas_collection = db["ideas"]
 ticket_collection = db["ticket"]
-apply_collection = db["apply"]
\ No newline at end of file
+apply_collection = db["apply"]
+massrole_jobs_collection = db["massrole_jobs"]
+broadcast_deliveries_collection = db["broadcast_deliveries"]
+bot_state_collection = db["bot_state"]
+
+
+# --- Index : un par forme de requête utilisée par les cogs ---
+# (soutien, images_only et bot_state sont lus par _id : l'index par défaut suffit)
+INDEXES: dict = {
+    stats_collection: [
+        # upserts du tampon stats (daily/channel) et lectures par serveur ou par membre
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("type", ASCENDING), ("date", ASCENDING)]),
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("type", ASCENDING), ("channel_id", ASCENDING)]),
+        # classements /server-stats : lignes du jour ou lignes salon d'un serveur, sans passer par user_id
+        IndexModel([("guild_id", ASCENDING), ("type", ASCENDING), ("date", ASCENDING), ("msg_count", DESCENDING)]),
+    ],
+    afk_collection: [
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING)]),
+    ],
+    confession_collection: [
+        IndexModel([("kind", ASCENDING), ("guild_id", ASCENDING), ("user_id", ASCENDING)]),
+    ],
+    suggestions_collection: [
+        IndexModel([("kind", ASCENDING), ("guild_id", ASCENDING)]),
+    ],
+    role_config_collection: [IndexModel([("guild_id", ASCENDING)])],
+    role_panel_collection: [IndexModel([("guild_id", ASCENDING), ("message_id", ASCENDING)])],
+    profile_collection: [
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING)]),
+        IndexModel([("guild_id", ASCENDING), ("published_at", ASCENDING)]),   # lots de republication
+        IndexModel([("guild_id", ASCENDING)], name="profile_dirty", partialFilterExpression={"dirty": True}),
+    ],
+    custom_voc_collection: [IndexModel([("guild_id", ASCENDING)])],
+    apply_collection: [IndexModel([("server_id", ASCENDING)])],
+    ideas_collection: [IndexModel([("owner_id", ASCENDING), ("created_at", ASCENDING)])],
+    giveaways_collection: [IndexModel([("ends_at", ASCENDING)])],
+    challenges_collection: [
+        IndexModel([("deadline", ASCENDING)]),
+        IndexModel([("submissions.submission_id", ASCENDING)]),   # votes (filtre $elemMatch)
+        IndexModel([("message_id", ASCENDING)]),   # anciens boutons sans identifiant de challenge
+    ],
+    moderation_collection: [
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("action", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("action", ASCENDING), ("timestamp", DESCENDING)]),   # compteurs tous serveurs
+    ],
+    mod_settings_collection: [IndexModel([("guild_id", ASCENDING)])],
+    massrole_jobs_collection: [IndexModel([("status", ASCENDING)])],
+    ticket_collection: [
+        # config et comptes par état (kind=config|ticket), fenêtres SLA de /ticket-stats
+        IndexModel([("kind", ASCENDING), ("guild_id", ASCENDING), ("state", ASCENDING)]),
+        IndexModel([("kind", ASCENDING), ("guild_id", ASCENDING), ("created_at", DESCENDING)]),
+        # boutons : le ticket est retrouvé par son salon (un seul ticket par salon) ;
+        # remplace channel_id_1 (non unique), supprimé par ensure_indexes
+        IndexModel(
+            [("channel_id", ASCENDING)], name="ticket_channel_id", unique=True,
+            partialFilterExpression={"kind": "ticket"}
+        ),
+    ],
+    broadcast_deliveries_collection: [
+        IndexModel([("broadcast_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("guild_id", ASCENDING), ("at", DESCENDING)]),
+    ],
+}
+
+# Index remplacés, supprimés une fois ceux de INDEXES créés (jamais avant : la collection garde un index utilisable)
+OBSOLETE_INDEXES: dict = {
+    ticket_collection: ["channel_id_1"],
+}
+
+
+async def ensure_indexes() -> None:
+    """
+    Crée les index déclarés (idempotent) puis supprime les index remplacés.
+    Un échec est journalisé sans bloquer le démarrage.
+    """
+    async def create(collection, models):
+        try:
+            await collection.create_indexes(models)
+        except Exception:
+            log.exception("Impossible de créer les index de %s", collection.name)
+            return
+        for name in OBSOLETE_INDEXES.get(collection, ()):
+            try:
+                await collection.drop_index(name)
+                log.info("Index obsolète %s.%s supprimé", collection.name, name)
+            except OperationFailure as e:
+                if e.code != 27:   # IndexNotFound : déjà supprimé
+                    log.exception("Impossible de supprimer l'index %s.%s", collection.name, name)
+
+    await asyncio.gather(*(create(c, m) for c, m in INDEXES.items()))
+
+
+# --- Santé : latence du dernier ping, mise à jour par task/mongo_health.py ---
+mongo_health = {"ok": None, "latency_ms": None, "checked_at": None, "failures": 0}
+
+
+async def ping() -> float:
+    """Envoie un ping au serveur et met à jour `mongo_health`. Renvoie la latence en ms."""
+    start = time.perf_counter()
+    try:
+        await mongo_client.admin.command("ping")
+    except Exception:
+        mongo_health.update(ok=False, latency_ms=None, checked_at=datetime.utcnow())
+        mongo_health["failures"] += 1
+        raise
+    latency = (time.perf_counter() - start) * 1000
+    mongo_health.update(ok=True, latency_ms=latency, checked_at=datetime.utcnow())
+    return latency
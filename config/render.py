@@ -0,0 +1,379 @@
+# config/render.py
+# Service de rendu HTML → PNG partagé par tous les cogs (profils, member-stats, server-stats).
+# Un seul Chromium reste chaud pour tout le bot, avec un petit pool de pages réutilisables.
+# Playwright et Jinja2 ne sont importés qu'au premier rendu : les cogs qui importent ce module
+# (et le démarrage du bot) ne paient pas le coût de la pile de rendu tant qu'elle ne sert pas.
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+from collections import OrderedDict
+
+log = logging.getLogger("elda.render")
+
+RENDER_MAX_PAGES = int(os.getenv("RENDER_MAX_PAGES", 3))     # rendus simultanés (= pages ouvertes max)
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", 20))    # rendus en attente avant refus
+RENDER_TIMEOUT   = float(os.getenv("RENDER_TIMEOUT", 30))    # secondes par opération Playwright
+RENDER_WARMUP    = os.getenv("RENDER_WARMUP", "0") == "1"    # lancer Chromium dès le démarrage
+
+ASSETS_DIR   = "assets"
+ASSET_ORIGIN = "https://assets.elda.local"   # origine fictive, servie depuis la mémoire par page.route
+
+PNG_CACHE_MAX      = int(os.getenv("PNG_CACHE_MAX", 256))      # PNG gardés en mémoire
+PNG_CACHE_DIR      = os.getenv("PNG_CACHE_DIR") or None        # débordement disque (désactivé si vide)
+PNG_CACHE_DISK_MAX = int(os.getenv("PNG_CACHE_DISK_MAX", 2000))
+
+class StaticAssets:
+    """
+    Fichiers de assets/ lus une seule fois et gardés en mémoire. Les templates les référencent
+    par URL (`asset_url`) et Chromium les reçoit via page.route : rien n'est relu sur disque
+    ni encodé en Base64 dans le HTML à chaque rendu.
+    """
+
+    def __init__(self, directory: str = ASSETS_DIR):
+        self.directory = directory
+        self._files: dict[str, tuple[bytes, str, str]] = {}   # nom -> (contenu, mime, empreinte)
+
+    def preload(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                self._load(entry.name)
+        log.info("%d asset(s) de rendu préchargé(s)", len(self._files))
+
+    def _load(self, name: str):
+        path = os.path.join(self.directory, name)
+        if os.path.dirname(os.path.normpath(name)) or not os.path.isfile(path):
+            return None   # pas de sous-chemin : uniquement les fichiers du dossier
+        with open(path, "rb") as f:
+            body = f.read()
+        mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self._files[name] = (body, mime, hashlib.sha1(body).hexdigest()[:12])
+        return self._files[name]
+
+    def get(self, name: str):
+        return self._files.get(name) or self._load(name)
+
+    def version(self, name: str) -> str:
+        """Empreinte du contenu, pour les clés de cache."""
+        asset = self.get(name)
+        return asset[2] if asset else ""
+
+
+static_assets = StaticAssets()
+
+
+def asset_url(name: str) -> str:
+    return f"{ASSET_ORIGIN}/{name}"
+
+
+_template_env = None
+
+
+def get_template_env():
+    """Environnement Jinja2 unique pour tous les templates HTML, créé au premier rendu."""
+    global _template_env
+    if _template_env is None:
+        import jinja2
+        _template_env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader("templates"),
+            autoescape=jinja2.select_autoescape(["html", "xml"]),
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+        _template_env.globals["asset_url"] = asset_url
+    return _template_env
+
+
+_template_versions: dict[str, str] = {}
+
+
+def template_version(name: str) -> str:
+    """Empreinte du fichier template : modifier le HTML invalide de fait les PNG en cache."""
+    version = _template_versions.get(name)
+    if version is None:
+        with open(os.path.join("templates", name), "rb") as f:
+            version = hashlib.sha1(f.read()).hexdigest()[:12]
+        _template_versions[name] = version
+    return version
+
+
+class RenderCache:
+    """
+    Cache LRU de PNG rendus, indexé par une empreinte du contenu (template + données).
+    Les entrées évincées de la mémoire débordent sur disque si PNG_CACHE_DIR est défini.
+    `owner` permet d'invalider l'image courante d'un objet (ex. un profil modifié).
+    """
+
+    def __init__(self, max_entries: int = PNG_CACHE_MAX, disk_dir: str | None = PNG_CACHE_DIR,
+                 disk_max: int = PNG_CACHE_DISK_MAX):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max = disk_max
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._disk: OrderedDict[str, None] = OrderedDict()   # clés présentes sur disque, LRU
+        self._owners: dict[object, str] = {}
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            files = sorted(
+                (e for e in os.scandir(disk_dir) if e.name.endswith(".png")),
+                key=lambda e: e.stat().st_mtime
+            )
+            for entry in files:
+                self._disk[entry.name[:-4]] = None
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.png")
+
+    async def get(self, key: str) -> bytes | None:
+        png = self._memory.get(key)
+        if png is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return png
+        if key in self._disk:
+            try:
+                png = await asyncio.to_thread(self._read, key)
+            except OSError:
+                self._disk.pop(key, None)
+            else:
+                self._disk.move_to_end(key)   # le fichier reste valable : pas de réécriture au prochain débordement
+                self.hits += 1
+                await self._store(key, png)
+                return png
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, png: bytes, owner=None) -> None:
+        if owner is not None:
+            previous = self._owners.get(owner)
+            if previous is not None and previous != key:
+                await self._drop(previous)
+            self._owners[owner] = key
+        await self._store(key, png)
+
+    async def invalidate(self, owner) -> None:
+        key = self._owners.pop(owner, None)
+        if key is not None:
+            await self._drop(key)
+
+    async def _store(self, key: str, png: bytes) -> None:
+        self._memory[key] = png
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            old_key, old_png = self._memory.popitem(last=False)
+            if self.disk_dir:
+                await self._spill(old_key, old_png)
+
+    async def _spill(self, key: str, png: bytes) -> None:
+        if key in self._disk:
+            return
+        try:
+            await asyncio.to_thread(self._write, key, png)
+        except OSError:
+            log.warning("Impossible d'écrire le PNG %s sur disque", key)
+            return
+        self._disk[key] = None
+        self._disk.move_to_end(key)
+        while len(self._disk) > self.disk_max:
+            old_key, _ = self._disk.popitem(last=False)
+            await asyncio.to_thread(self._unlink, old_key)
+
+    async def _drop(self, key: str) -> None:
+        self._memory.pop(key, None)
+        if self._disk.pop(key, "absent") is None:
+            await asyncio.to_thread(self._unlink, key)
+
+    def _read(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def _write(self, key: str, png: bytes) -> None:
+        with open(self._path(key), "wb") as f:
+            f.write(png)
+
+    def _unlink(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class RenderPool:
+    """Navigateur Chromium persistant + pool borné de pages, avec file d'attente et relance auto."""
+
+    def __init__(self, max_pages: int = RENDER_MAX_PAGES, max_queue: int = RENDER_MAX_QUEUE):
+        self.max_pages = max_pages
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_pages)
+        self._launch_lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        # Un contexte par facteur d'échelle (fixé à sa création), partagé par ses pages
+        self._contexts: dict[float, object] = {}
+        # Pages libres, rangées par facteur d'échelle
+        self._idle: dict[float, list] = {}
+        self._waiting = 0
+        self.renders = 0
+        self.restarts = 0
+
+    def _alive(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        """Lance Chromium s'il ne tourne pas déjà (appelé aussi automatiquement au premier rendu)."""
+        async with self._launch_lock:
+            if self._alive():
+                return self._browser
+            if self._browser is not None:
+                self.restarts += 1
+                log.warning("Chromium ne répond plus, relance (#%d)", self.restarts)
+            await self._shutdown()
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(args=["--no-sandbox"])
+            log.info("Chromium lancé pour le pool de rendu (%d pages max)", self.max_pages)
+            return self._browser
+
+    async def close(self):
+        """Ferme proprement le navigateur (arrêt du bot)."""
+        async with self._launch_lock:
+            await self._shutdown()
+
+    async def _shutdown(self):
+        self._idle.clear()
+        self._contexts.clear()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    async def _checkout(self, scale: float):
+        browser = await self.start()  # relance Chromium (et vide les pages mortes) si besoin
+        pages = self._idle.setdefault(scale, [])
+        while pages:
+            page = pages.pop()
+            if not page.is_closed():
+                return page
+        # Aucune page libre à cette échelle : on en recycle une autre pour rester sous max_pages
+        for other in self._idle.values():
+            if other:
+                await self._discard(other.pop())
+                break
+        context = self._contexts.get(scale)
+        if context is None:
+            context = await browser.new_context(device_scale_factor=scale)
+            await context.route(f"{ASSET_ORIGIN}/**", self._serve_asset)
+            self._contexts[scale] = context
+        page = await context.new_page()
+        page.set_default_timeout(RENDER_TIMEOUT * 1000)
+        return page
+
+    async def _serve_asset(self, route):
+        name = route.request.url[len(ASSET_ORIGIN) + 1:].split("?")[0]
+        asset = static_assets.get(name)
+        if asset is None:
+            await route.abort()
+        else:
+            await route.fulfill(status=200, body=asset[0], content_type=asset[1])
+
+    def _checkin(self, scale: float, page):
+        if self._alive() and not page.is_closed():
+            self._idle.setdefault(scale, []).append(page)
+
+    async def _discard(self, page):
+        # Seule la page est fermée : le contexte de son échelle reste partagé
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def render(
+        self,
+        template: str,
+        context: dict,
+        viewport: dict,
+        clip: dict | None = None,
+        *,
+        selector: str | None = None,
+        full_page: bool = False,
+        scale: float = 1,
+        omit_background: bool = False,
+    ) -> bytes:
+        """
+        Rend `template` avec `context` et renvoie le PNG.
+        - clip      : zone à capturer (page entière sinon)
+        - selector  : capture uniquement cet élément (ex. ".card")
+        Lève RuntimeError si la file est pleine ou si le rendu échoue.
+        """
+        from playwright.async_api import Error as PWError
+
+        html = get_template_env().get_template(template).render(**context)
+
+        if self._waiting >= self.max_queue:
+            raise RuntimeError("Trop de rendus en cours, réessayez dans un instant")
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            # 2 tentatives : la seconde seulement si Chromium a planté pendant la première
+            for attempt in (1, 2):
+                page = None
+                try:
+                    # Le lancement de Chromium est dans le try : un échec devient aussi RuntimeError
+                    page = await self._checkout(scale)
+                    await page.set_viewport_size(viewport)
+                    await page.set_content(html, wait_until="networkidle")
+                    if selector:
+                        element = await page.query_selector(selector)
+                        if element is None:
+                            self._checkin(scale, page)
+                            page = None
+                            raise RuntimeError(f"Aucun élément ne correspond à {selector!r} dans {template}")
+                        png = await element.screenshot(omit_background=omit_background)
+                    else:
+                        png = await page.screenshot(
+                            omit_background=omit_background, clip=clip, full_page=full_page
+                        )
+                except PWError as e:
+                    if page is not None:
+                        await self._discard(page)
+                    if attempt == 1 and not self._alive():
+                        continue
+                    log.exception("Échec du rendu de %s", template)
+                    raise RuntimeError("Échec de génération de l’image") from e
+                except BaseException:
+                    if page is not None:
+                        await self._discard(page)
+                    raise
+
+                self._checkin(scale, page)
+                self.renders += 1
+                return png
+        finally:
+            self._slots.release()
+
+
+# Instance unique utilisée par tout le bot
+render_pool = RenderPool()
@@ -0,0 +1,18 @@
+# config/router.py
+# Boutons routés par custom_id : tout l'état tient dans le custom_id et le clic est traité par
+# un discord.ui.DynamicItem (template regex) enregistré une seule fois avec bot.add_dynamic_items
+# dans le cog qui le possède. Le ViewStore de discord.py fait le routage : aucune vue n'est gardée
+# par message et les boutons fonctionnent après un redémarrage, sans add_view.
+import discord
+
+
+def routed_view(*items: discord.ui.Item) -> discord.ui.View:
+    """
+    Vue à envoyer avec des DynamicItem. Elle est arrêtée avant l'envoi : le ViewStore
+    ne la garde pas, les clics passent par les templates enregistrés.
+    """
+    view = discord.ui.View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    view.stop()
+    return view
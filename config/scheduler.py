@@ -0,0 +1,78 @@
+# config/scheduler.py
+# Planificateur d'échéances en mémoire : un tas (min-heap) trié par date et une seule tâche
+# qui dort jusqu'à la prochaine échéance, au lieu de boucles qui rescannent Mongo chaque minute.
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone
+
+log = logging.getLogger("elda.scheduler")
+
+
+def _as_utc(when: datetime) -> datetime:
+    # Les documents Mongo renvoient des datetimes naïfs en UTC
+    return when.replace(tzinfo=timezone.utc) if when.tzinfo is None else when
+
+
+class DeadlineScheduler:
+    """
+    Appelle `callback(key)` à l'heure `when` ; O(log n) par ajout, aucun polling.
+    `concurrency` borne le nombre de callbacks exécutés en parallèle.
+    """
+
+    def __init__(self, callback, name: str = "scheduler", concurrency: int = 1):
+        self.callback = callback
+        self.name = name
+        self._heap: list[tuple[datetime, int, object]] = []
+        self._seq = itertools.count()        # départage les échéances identiques
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, when: datetime, key) -> None:
+        heapq.heappush(self._heap, (_as_utc(when), next(self._seq), key))
+        self._wake.set()   # la nouvelle échéance est peut-être la plus proche
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in self._running:
+            task.cancel()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            when = self._heap[0][0]
+            delay = (when - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._slots.acquire()
+            _, _, key = heapq.heappop(self._heap)
+            task = asyncio.create_task(self._fire(key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, key):
+        try:
+            await self.callback(key)
+        except Exception:
+            log.exception("[%s] Échec du traitement de l'échéance %s", self.name, key)
+        finally:
+            self._slots.release()
@@ -0,0 +1,139 @@
+# config/transcript.py
+# Transcriptions de salons écrites au fil de l'eau dans un fichier temporaire :
+# l'historique est parcouru page par page (100 messages par requête) et chaque message
+# est écrit dès sa réception, la mémoire reste bornée quelle que soit la longueur du ticket.
+import html
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+import discord
+
+log = logging.getLogger("elda.transcript")
+
+TRANSCRIPT_FORMATS = ("html", "txt")
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>
+  body {{ background: #313338; color: #dbdee1; font-family: 'Segoe UI', sans-serif; margin: 0; padding: 24px; }}
+  h1 {{ font-size: 20px; margin: 0 0 16px; }}
+  .msg {{ display: flex; gap: 12px; padding: 6px 0; }}
+  .avatar {{ width: 40px; height: 40px; border-radius: 50%; flex-shrink: 0; }}
+  .author {{ font-weight: 600; color: #f2f3f5; }}
+  .time {{ color: #949ba4; font-size: 12px; margin-left: 6px; }}
+  .content {{ white-space: pre-wrap; word-wrap: break-word; }}
+  .attachment a {{ color: #00a8fc; }}
+  .embed {{ border-left: 4px solid #5865f2; background: #2b2d31; padding: 8px 12px; margin-top: 4px; border-radius: 4px; }}
+  .embed-title {{ font-weight: 600; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+_HTML_TAIL = "</body>\n</html>\n"
+
+
+@dataclass
+class Transcript:
+    path: str
+    filename: str
+    messages: int
+    attachments: int
+    seconds: float
+    size: int
+
+    def cleanup(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _embed_text(embed: discord.Embed) -> tuple[str, str]:
+    return embed.title or "", embed.description or ""
+
+
+def _write_txt(f, msg: discord.Message) -> int:
+    f.write(f"[{msg.created_at.isoformat()}] {msg.author}: {msg.content}\n")
+    for embed in msg.embeds:
+        title, description = _embed_text(embed)
+        if title or description:
+            f.write(f"    [embed] {title} {description}".rstrip() + "\n")
+    for attachment in msg.attachments:
+        f.write(f"    [pièce jointe] {attachment.filename} : {attachment.url}\n")
+    return len(msg.attachments)
+
+
+def _write_html(f, msg: discord.Message) -> int:
+    esc = html.escape
+    f.write('<div class="msg">')
+    f.write(f'<img class="avatar" src="{esc(msg.author.display_avatar.url)}" alt="">')
+    f.write("<div>")
+    f.write(
+        f'<span class="author">{esc(str(msg.author))}</span>'
+        f'<span class="time">{msg.created_at.strftime("%d/%m/%Y %H:%M:%S")} UTC</span>'
+    )
+    if msg.content:
+        f.write(f'<div class="content">{esc(msg.content)}</div>')
+    for embed in msg.embeds:
+        title, description = _embed_text(embed)
+        if title or description:
+            f.write('<div class="embed">')
+            if title:
+                f.write(f'<div class="embed-title">{esc(title)}</div>')
+            if description:
+                f.write(f'<div class="content">{esc(description)}</div>')
+            f.write("</div>")
+    for attachment in msg.attachments:
+        f.write(
+            f'<div class="attachment">📎 <a href="{esc(attachment.url)}">{esc(attachment.filename)}</a></div>'
+        )
+    f.write("</div></div>\n")
+    return len(msg.attachments)
+
+
+async def write_transcript(channel: discord.TextChannel, fmt: str = "html") -> Transcript:
+    """
+    Écrit l'historique complet du salon dans un fichier temporaire et renvoie son chemin.
+    L'appelant envoie le fichier (discord.File(path) le lit en flux) puis appelle cleanup().
+    """
+    if fmt not in TRANSCRIPT_FORMATS:
+        fmt = "html"
+    writer = _write_html if fmt == "html" else _write_txt
+    start = time.perf_counter()
+    messages = attachments = 0
+
+    fd, path = tempfile.mkstemp(prefix="transcript_", suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            if fmt == "html":
+                f.write(_HTML_HEAD.format(title=html.escape(f"Transcription de #{channel.name}")))
+            async for msg in channel.history(limit=None, oldest_first=True):
+                attachments += writer(f, msg)
+                messages += 1
+            if fmt == "html":
+                f.write(_HTML_TAIL)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(path)
+    log.info(
+        "Transcription de #%s : %d messages en %.2fs (%.1f ms/message, %d Ko)",
+        channel.name, messages, seconds, seconds * 1000 / max(messages, 1), size // 1024
+    )
+    return Transcript(
+        path=path,
+        filename=f"{channel.name}_transcript.{fmt}",
+        messages=messages,
+        attachments=attachments,
+        seconds=seconds,
+        size=size,
+    )
@@ -1,20 +1,29 @@
 import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
 import logging
+import contextvars
+from datetime import datetime
 from pathlib import Path
 
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
 from rich.console import Console
 
+from config.render import render_pool, static_assets, RENDER_WARMUP
+from config.mongo import bot_state_collection, ensure_indexes
+
 # ─── Configuration de base ────────────────────────────────────────────────────
 load_dotenv()
 DISCORD_TOKEN  = os.getenv("DISCORD_TOKEN")
-MONGO_URI      = os.getenv("MONGO_URI")
-DATABASE_NAME  = os.getenv("DATABASE_NAME")
 OWNER_ID       = int(os.getenv("BOT_OWNER_ID", 0))
 STATUS_MESSAGE = "Bonjour chez melo"
+STARTUP_PROFILE_PATH = os.getenv("STARTUP_PROFILE_PATH", "startup_profile.json")
+IMPORT_PROFILE = os.getenv("IMPORT_PROFILE", "0") == "1"   # liste les modules importés par extension
 
 # ─── Logger “joli” ──────────────────────────────────────────────────────────
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +33,9 @@ for name in ("discord", "discord.client", "discord.gateway", "discord.ext.comman
 
 console = Console()
 
+# Extension en cours de chargement dans la tâche courante (chargement concurrent)
+_loading_ext: contextvars.ContextVar[str | None] = contextvars.ContextVar("loading_ext", default=None)
+
 
 class EldaBot(commands.Bot):
     def __init__(self):
@@ -44,29 +56,118 @@ class EldaBot(commands.Bot):
 
         self.loaded_ext: list[str] = []
         self.failed_ext: list[str] = []
+        # module -> {"import": s, "setup": s} ; "import" couvre aussi la construction du cog
+        self.ext_timings: dict[str, dict[str, float]] = {}
+        self.startup_timings: dict[str, float] = {}
+        self._cog_marks: dict[str, float] = {}
+        self._startup_reported = False
+        # IMPORT_PROFILE=1 : module -> paquets tiers/internes importés pour la première fois par l'extension
+        self.ext_imports: dict[str, list[str]] = {}
+        self._modules_before: dict[str, set[str]] = {}
+
+    async def add_cog(self, cog, /, **kwargs):
+        # Premier add_cog d'une extension = fin de l'import (exec_module est synchrone)
+        module = _loading_ext.get()
+        if module is not None and module not in self._cog_marks:
+            self._cog_marks[module] = time.perf_counter()
+            before = self._modules_before.pop(module, None)
+            if before is not None:
+                new = {name.split(".")[0] for name in sys.modules.keys() - before}
+                new.discard(module.split(".")[0])
+                self.ext_imports[module] = sorted(new)
+        return await super().add_cog(cog, **kwargs)
+
+    async def _load_timed(self, module: str):
+        _loading_ext.set(module)
+        if IMPORT_PROFILE:
+            # Aucun await entre ici et le premier add_cog : le diff n'attribue que cette extension
+            self._modules_before[module] = set(sys.modules)
+        start = time.perf_counter()
+        try:
+            await self.load_extension(module)
+        except Exception as e:
+            logger.exception(f"Failed to load extension {module}: {e}")
+            self.failed_ext.append(module)
+            return
+        end = time.perf_counter()
+        mark = self._cog_marks.pop(module, end)
+        self.ext_timings[module] = {"import": mark - start, "setup": end - mark}
+        self.loaded_ext.append(module)
 
     async def setup_hook(self):
-        """Charge récursivement les extensions et synchronise les slash commands."""
+        """Charge les extensions en parallèle et synchronise les slash commands."""
         base = Path(__file__).parent
+        t0 = time.perf_counter()
 
+        modules = []
         for pkg in ("commands", "task"):
             folder = base / pkg
-            for file in folder.rglob("*.py"):
+            for file in sorted(folder.rglob("*.py")):
                 if file.name.startswith("_") or file.name == "__init__.py":
                     continue
 
                 rel = file.relative_to(base).with_suffix("")
-                module = ".".join(rel.parts)
-
-                try:
-                    await self.load_extension(module)
-                    self.loaded_ext.append(module)
-                except Exception as e:
-                    logger.exception(f"Failed to load extension {module}: {e}")
-                    self.failed_ext.append(module)
+                modules.append(".".join(rel.parts))
+
+        # Les imports restent séquentiels (synchrones) ; les setup/cog_load (Mongo…) et la
+        # création des index se chevauchent
+        await asyncio.gather(ensure_indexes(), *(self._load_timed(m) for m in modules))
+        self.loaded_ext.sort()
+        t1 = time.perf_counter()
+
+        # Synchronisation des commandes slash (seulement si l'arbre a changé)
+        await self.sync_tree()
+        t2 = time.perf_counter()
+        self.startup_timings = {"extensions": t1 - t0, "tree_sync": t2 - t1}
+
+        # Assets des templates lus une fois (quelques fichiers, sans importer Playwright)
+        static_assets.preload()
+
+        # Préchauffe le Chromium partagé sans retarder la connexion (optionnel : sinon au premier rendu)
+        if RENDER_WARMUP:
+            self.loop.create_task(render_pool.start())
+
+    def tree_hash(self) -> str:
+        """Empreinte de l'arbre de commandes tel qu'il serait envoyé à Discord."""
+        payload = sorted(
+            (c.to_dict(self.tree) for c in self.tree.get_commands()),
+            key=lambda c: (c.get("type", 1), c["name"])
+        )
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    async def sync_tree(self, force: bool = False) -> list[discord.app_commands.AppCommand] | None:
+        """
+        Appelle tree.sync() uniquement si l'empreinte diffère de celle du dernier sync
+        (stockée dans Mongo). Renvoie les commandes acceptées par Discord, None sans synchronisation.
+        """
+        digest = self.tree_hash()
+        state_id = f"command_tree:{self.application_id}"
+        if not force:
+            try:
+                state = await bot_state_collection.find_one({"_id": state_id})
+            except Exception:
+                logger.warning("Empreinte de l'arbre illisible, synchronisation par sécurité")
+                state = None
+            if state and state.get("hash") == digest:
+                logger.info("Arbre de commandes inchangé, pas de synchronisation")
+                return None
+
+        synced = await self.tree.sync()
+        logger.info("%d commande(s) synchronisée(s)", len(synced))
+        try:
+            await bot_state_collection.update_one(
+                {"_id": state_id},
+                {"$set": {"hash": digest, "synced_at": datetime.utcnow(), "count": len(synced)}},
+                upsert=True
+            )
+        except Exception:
+            logger.warning("Impossible d'enregistrer l'empreinte de l'arbre de commandes")
+        return synced
 
-        # Synchronisation des commandes slash
-        await self.tree.sync()
+    async def close(self):
+        """Décharge les cogs puis ferme le navigateur du pool de rendu."""
+        await super().close()
+        await render_pool.close()
 
     async def on_ready(self):
         # Affichage de connexion
@@ -91,10 +192,42 @@ class EldaBot(commands.Bot):
             f"{len(self.tree.get_commands())} slash command(s)."
         )
 
+        self.report_startup()
+
+    def report_startup(self):
+        """Affiche les extensions les plus lentes et écrit le profil de démarrage en JSON."""
+        if not self.ext_timings or self._startup_reported:
+            return   # on_ready est rappelé à chaque reconnexion
+        slowest = sorted(
+            self.ext_timings.items(), key=lambda kv: kv[1]["import"] + kv[1]["setup"], reverse=True
+        )
+        console.print(
+            f"⏱️ Extensions chargées en {self.startup_timings['extensions']:.2f}s, "
+            f"sync de l'arbre {self.startup_timings['tree_sync']:.2f}s. Les plus lentes :"
+        )
+        for module, t in slowest[:5]:
+            console.print(f"   • {module} : import {t['import']*1000:.0f} ms, setup {t['setup']*1000:.0f} ms")
+        if IMPORT_PROFILE:
+            console.print("📦 Paquets importés en premier par chaque extension :")
+            for module, packages in sorted(self.ext_imports.items()):
+                if packages:
+                    console.print(f"   • {module} : {', '.join(packages)}")
+
+        profile = {
+            "generated_at": datetime.utcnow().isoformat(),
+            "totals": self.startup_timings,
+            "failed": self.failed_ext,
+            "extensions": dict(slowest),
+        }
+        if IMPORT_PROFILE:
+            profile["imports"] = self.ext_imports
+        try:
+            with open(STARTUP_PROFILE_PATH, "w", encoding="utf-8") as f:
+                json.dump(profile, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Impossible d'écrire {STARTUP_PROFILE_PATH}: {e}")
+        self._startup_reported = True
 
-# ─── Connexion à MongoDB ───────────────────────────────────────────────────
-mongo_client = AsyncIOMotorClient(MONGO_URI)
-db = mongo_client[DATABASE_NAME]
 
 # ─── Point d’entrée ─────────────────────────────────────────────────────────
 if __name__ == "__main__":
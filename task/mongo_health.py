@@ -0,0 +1,42 @@
+# task/mongo_health.py
+# Ping périodique de MongoDB : alimente `mongo_health` (affiché par /botstat) et journalise les pannes.
+import logging
+import os
+
+from discord.ext import commands, tasks
+
+from config.mongo import ping, mongo_health
+
+logger = logging.getLogger(__name__)
+
+MONGO_PING_SECONDS = float(os.getenv("MONGO_PING_SECONDS", 30))
+MONGO_SLOW_MS      = float(os.getenv("MONGO_SLOW_MS", 250))   # au-delà : avertissement
+
+
+class MongoHealth(commands.Cog):
+    """Mesure la latence de MongoDB à intervalle régulier."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.check.start()
+
+    async def cog_unload(self):
+        self.check.cancel()
+
+    @tasks.loop(seconds=MONGO_PING_SECONDS)
+    async def check(self):
+        was_ok = mongo_health["ok"]
+        try:
+            latency = await ping()
+        except Exception as e:
+            if was_ok is not False:
+                logger.error(f"MongoDB injoignable : {e}")
+            return
+        if was_ok is False:
+            logger.info(f"MongoDB de nouveau joignable ({latency:.0f} ms)")
+        elif latency > MONGO_SLOW_MS:
+            logger.warning(f"MongoDB lent : ping {latency:.0f} ms")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(MongoHealth(bot))
@@ -2,7 +2,7 @@
 # complété
 import discord
 from discord.ext import commands
-from config.mongo import soutien_collection
+from config.cache import soutien_cache
 
 class SoutienListener(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -14,7 +14,8 @@ class SoutienListener(commands.Cog):
         if before.guild != after.guild:
             return
 
-        cfg = await soutien_collection.find_one({"_id": after.guild.id})
+        # Config servie depuis la mémoire : plus de requête Mongo par changement de statut
+        cfg = await soutien_cache.get(after.guild.id)
         if not cfg:
             return
 